@@ -0,0 +1,118 @@
+"""
+Totais em cache por subárvore
+
+Para cada tarefa que tem subtarefas, guarda (pendentes, concluídas,
+atrasadas, dia do prazo pendente mais próximo) da subárvore inteira,
+incluindo a própria tarefa. Uma alteração recalcula só a tarefa alterada
+e seus ancestrais, somando os totais já guardados dos filhos, em vez de
+percorrer a árvore toda.
+
+As folhas não ocupam espaço: os totais delas saem da própria tarefa.
+"""
+
+from collections import namedtuple
+
+from task_model import DONE, PENDING
+
+Aggregate = namedtuple("Aggregate", "pending completed overdue earliest")
+
+
+class SubtreeAggregates:
+    def __init__(self, deadlines):
+        # Dias de prazo e dia atual vêm do DeadlineClassifier
+        self.deadlines = deadlines
+        # id da tarefa -> Aggregate (somente tarefas com subtarefas)
+        self.values = {}
+
+    def clear(self):
+        self.values.clear()
+
+    def own(self, task):
+        """Totais da tarefa sozinha"""
+        if task.status != PENDING:
+            return Aggregate(0, 1 if task.status == DONE else 0, 0, None)
+        day = self.deadlines.deadline_day(task.id)
+        overdue = 1 if day is not None and (day < self.deadlines.today
+                                             or self.deadlines.is_expired(task.id)) else 0
+        return Aggregate(1, 0, overdue, day)
+
+    def get(self, task):
+        if not task.subtasks:
+            return self.own(task)
+        return self.values.get(task.id) or self.compute(task)
+
+    def compute(self, task):
+        """Recalcular os totais da tarefa a partir dos totais guardados dos filhos"""
+        pending, completed, overdue, earliest = self.own(task)
+        for subtask in task.subtasks:
+            child = self.get(subtask)
+            pending += child.pending
+            completed += child.completed
+            overdue += child.overdue
+            if child.earliest is not None and (earliest is None or child.earliest < earliest):
+                earliest = child.earliest
+
+        value = Aggregate(pending, completed, overdue, earliest)
+        if task.subtasks:
+            self.values[task.id] = value
+        else:
+            self.values.pop(task.id, None)
+        return value
+
+    def build(self, tasks):
+        """Calcular os totais de todas as tarefas (filhos antes dos pais)"""
+        order = []
+        stack = list(tasks)
+        while stack:
+            task = stack.pop()
+            order.append(task)
+            stack.extend(task.subtasks)
+        for task in reversed(order):
+            if task.subtasks:
+                self.compute(task)
+
+    def refresh_path(self, task_id, task_index, parent_index):
+        """Recalcular a tarefa e seus ancestrais; retorna os ids recalculados"""
+        refreshed = []
+        while task_id is not None:
+            task = task_index.get(task_id)
+            if task is None:
+                break
+            self.compute(task)
+            refreshed.append(task_id)
+            task_id = parent_index.get(task_id)
+        return refreshed
+
+    def refresh_many(self, task_ids, task_index, parent_index):
+        """Recalcular os ancestrais de várias tarefas, cada um uma única vez"""
+        depth = {}
+        for task_id in task_ids:
+            path = []
+            node = task_id
+            while node is not None and node not in depth and node in task_index:
+                path.append(node)
+                node = parent_index.get(node)
+            base = depth.get(node, 0) if node is not None else 0
+            for i, path_id in enumerate(reversed(path)):
+                depth[path_id] = base + i + 1
+
+        # Os mais profundos primeiro, para os pais somarem valores já atualizados
+        for task_id in sorted(depth, key=depth.get, reverse=True):
+            self.compute(task_index[task_id])
+        return set(depth)
+
+    def remove_tree(self, task):
+        stack = [task]
+        while stack:
+            node = stack.pop()
+            self.values.pop(node.id, None)
+            stack.extend(node.subtasks)
+
+    def progress(self, task):
+        """(concluídas, total) das subtarefas (sem a própria tarefa), ou None"""
+        if not task.subtasks:
+            return None
+        value = self.get(task)
+        own = self.own(task)
+        return (value.completed - own.completed,
+                value.pending + value.completed - own.pending - own.completed)
@@ -0,0 +1,78 @@
+"""
+Arquivo das tarefas concluídas
+
+Tarefas raiz concluídas (com todas as subtarefas) há mais de N dias saem da
+lista principal e vão para um arquivo separado (tasks_data_archive.json),
+que só é lido quando o usuário abre "Ver arquivo" ou restaura uma tarefa.
+Subtarefas concluídas de uma tarefa ainda pendente também são arquivadas,
+com o lugar de onde saíram em "archived_from" ([id do pai, id do irmão
+anterior]) para voltarem a ele ao serem restauradas.
+
+Os totais por status do arquivo ficam em um resumo à parte
+(tasks_data_archive.json.summary), para que o contador da janela inclua as
+tarefas arquivadas sem precisar ler o arquivo.
+"""
+
+import json
+import os
+from collections import Counter
+
+from storage import JsonStorage, fsync_file
+from task_model import count_tasks
+
+
+def archive_path(data_file):
+    return os.path.splitext(data_file)[0] + "_archive.json"
+
+
+class TaskArchive:
+    def __init__(self, path, data_format="pretty"):
+        self.storage = JsonStorage(path, data_format)
+        self.summary_path = path + ".summary"
+        self.counts = self.read_summary()
+
+    def read_summary(self):
+        if os.path.exists(self.summary_path):
+            try:
+                with open(self.summary_path, 'r', encoding='utf-8') as f:
+                    return Counter(json.load(f))
+            except Exception as e:
+                print(f"Erro ao ler o resumo do arquivo: {e}")
+        # Sem resumo: contar a partir do próprio arquivo
+        return count_tasks(self.load())
+
+    def load(self):
+        """Tarefas arquivadas (lidas do disco a cada chamada)"""
+        return self.storage.load()
+
+    def add(self, tasks):
+        """Arquivar tarefas; uma tarefa já arquivada com o mesmo id é substituída"""
+        ids = {task.id for task in tasks}
+        archived = [task for task in self.load() if task.id not in ids]
+        self.save(archived + list(tasks))
+
+    def find(self, task_id):
+        for task in self.load():
+            if task.id == task_id:
+                return task
+        return None
+
+    def remove(self, task_id):
+        """Tirar uma tarefa do arquivo e retorná-la"""
+        archived = self.load()
+        for i, task in enumerate(archived):
+            if task.id == task_id:
+                del archived[i]
+                self.save(archived)
+                return task
+        return None
+
+    def save(self, archived):
+        self.storage.save_all(archived)
+        self.counts = count_tasks(archived)
+
+        tmp_path = self.summary_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.counts, f, ensure_ascii=False)
+            fsync_file(f)
+        os.replace(tmp_path, self.summary_path)
@@ -0,0 +1,248 @@
+"""
+Benchmark do Gerenciador de Tarefas com dados sintéticos
+
+Gera arquivos tasks_data.json com 1k/10k/100k tarefas (subtarefas em vários
+níveis e textos longos) e mede tempo e pico de memória de:
+
+- load: leitura do arquivo e construção dos índices (TaskEngine.load)
+- save: gravação de todas as tarefas (JsonStorage.save_all)
+- refresh_tree: primeira página da árvore (Treeview real com DISPLAY, ou
+  uma árvore em memória sem interface)
+- find_task_by_id: buscas por id aleatórias
+- deadline_sweep: agendamento de todas as tarefas no DeadlineScheduler
+
+Uso:
+    python benchmark.py                       # 1000 10000 100000
+    python benchmark.py 10000 --output resultado.json
+    python benchmark.py --format binary
+
+Os resultados são gravados em JSON (por padrão em
+benchmark_results/<commit>.json) para comparar commits.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from data_format import FORMATS
+from notifications import DeadlineScheduler
+from storage import JsonStorage, write_tasks_atomic
+from task_engine import TaskEngine
+
+WORDS = ("reunião relatório cliente projeto revisar enviar proposta orçamento "
+         "código testes documentação equipe prazo entrega contrato planilha "
+         "apresentação ligar comprar pagar agendar corrigir publicar").split()
+
+# Quantidade de buscas por id medidas em find_task_by_id
+LOOKUPS = 10000
+
+
+def random_text(rng):
+    """Texto curto na maioria das vezes, às vezes um parágrafo longo"""
+    length = rng.choice((3, 6, 12, 40, 200))
+    return " ".join(rng.choice(WORDS) for _ in range(length)).capitalize()
+
+
+def generate_tasks(count, max_depth=4, seed=42):
+    """Lista de tarefas raiz com `count` tarefas no total (incluindo subtarefas)"""
+    rng = random.Random(seed)
+    now = time.time()
+    tasks = []
+    # (lista onde a próxima tarefa entra, profundidade)
+    open_lists = [(tasks, 0)]
+
+    for i in range(count):
+        target, depth = rng.choice(open_lists) if rng.random() < 0.6 else (tasks, 0)
+        deadline = now + rng.randint(-10, 60) * 86400
+        task = {
+            "id": f"{now:.6f}-{i}",
+            "text": random_text(rng),
+            "status": "Concluída" if rng.random() < 0.3 else "Pendente",
+            "created": datetime.fromtimestamp(now - rng.randint(0, 90) * 86400).strftime("%d/%m/%Y %H:%M"),
+            "deadline": datetime.fromtimestamp(deadline).strftime("%d/%m/%Y"),
+            "deadline_timestamp": deadline,
+            "subtasks": []
+        }
+        target.append(task)
+        if depth < max_depth:
+            open_lists.append((task["subtasks"], depth + 1))
+        if len(open_lists) > 50:
+            del open_lists[1]
+
+    return tasks
+
+
+class StubTree:
+    """Árvore em memória com a parte da API do Treeview usada pela interface"""
+
+    def __init__(self):
+        self.children = {"": []}
+        self.parents = {}
+        self.items = {}
+
+    def insert(self, parent, index, iid, **options):
+        self.items[iid] = options
+        self.parents[iid] = parent
+        self.children[iid] = []
+        if index == "end":
+            self.children[parent].append(iid)
+        else:
+            self.children[parent].insert(index, iid)
+        return iid
+
+    def item(self, iid, **options):
+        self.items[iid].update(options)
+
+    def delete(self, *iids):
+        for iid in iids:
+            self.children[self.parents[iid]].remove(iid)
+            stack = [iid]
+            while stack:
+                node = stack.pop()
+                stack.extend(self.children.pop(node))
+                del self.items[node]
+                del self.parents[node]
+
+    def exists(self, iid):
+        return iid in self.items
+
+    def get_children(self, iid=""):
+        return tuple(self.children[iid])
+
+
+class StubLabel:
+    def config(self, **options):
+        self.options = options
+
+
+def create_view(engine):
+    """TaskManagerApp só com a árvore, ligado ao engine (sem janela principal)"""
+    from main import TaskManagerApp
+
+    view = object.__new__(TaskManagerApp)
+    view.engine = engine
+    view.data_loaded = True
+
+    if os.environ.get("DISPLAY"):
+        import tkinter as tk
+        from tkinter import ttk
+
+        view.root = tk.Tk()
+        view.root.withdraw()
+        view.tree = ttk.Treeview(view.root, columns=("Status", "Prazo", "Criado", "Dias"))
+        view.task_count_label = ttk.Label(view.root)
+    else:
+        view.root = None
+        view.tree = StubTree()
+        view.task_count_label = StubLabel()
+
+    view.reset_view()
+    return view
+
+
+def measure(run, setup=None):
+    """Tempo (s) de uma execução e pico de memória (bytes) de outra, com tracemalloc"""
+    arg = setup() if setup else None
+    start = time.perf_counter()
+    run(arg)
+    elapsed = time.perf_counter() - start
+
+    arg = setup() if setup else None
+    tracemalloc.start()
+    run(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"seconds": round(elapsed, 6), "peak_bytes": peak}
+
+
+def benchmark_size(count, workdir, data_format="pretty"):
+    data_file = os.path.join(workdir, f"tasks_{count}.json")
+    write_tasks_atomic(data_file, generate_tasks(count))
+    storage = JsonStorage(data_file, data_format)
+    storage.save_all(storage.load())
+
+    engine = TaskEngine(storage)
+    results = {"tasks": count, "file_bytes": os.path.getsize(data_file)}
+
+    results["load"] = measure(lambda _: engine.load())
+    results["save"] = measure(lambda _: storage.save_all(engine.tasks))
+
+    def new_view():
+        if getattr(new_view, "view", None) and new_view.view.root:
+            new_view.view.root.destroy()
+        new_view.view = create_view(engine)
+        return new_view.view
+
+    results["refresh_tree"] = measure(lambda view: view.refresh_tree(), new_view)
+    if new_view.view.root:
+        new_view.view.root.destroy()
+
+    ids = random.Random(1).choices(list(engine.task_index), k=LOOKUPS)
+    results["find_task_by_id"] = measure(lambda _: [engine.find_task_by_id(i) for i in ids])
+    results["find_task_by_id"]["lookups"] = LOOKUPS
+
+    def sweep(scheduler):
+        for task in engine.tasks:
+            scheduler.schedule_tree(task, remind_now=True)
+
+    results["deadline_sweep"] = measure(
+        sweep, lambda: DeadlineScheduler(lambda task, lead: None, engine.deadlines)
+    )
+
+    engine.close()
+    return results
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do Gerenciador de Tarefas")
+    parser.add_argument("sizes", nargs="*", type=int, default=[1000, 10000, 100000])
+    parser.add_argument("--format", choices=FORMATS, default="pretty",
+                        help="formato do arquivo de tarefas (data_format)")
+    parser.add_argument("--output", help="arquivo JSON de resultados")
+    args = parser.parse_args()
+
+    commit = current_commit()
+    report = {
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "tree": "tk" if os.environ.get("DISPLAY") else "stub",
+        "data_format": args.format,
+        "results": []
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for count in args.sizes:
+            results = benchmark_size(count, workdir, args.format)
+            report["results"].append(results)
+            print(f"{count} tarefas:")
+            for name, value in results.items():
+                if isinstance(value, dict):
+                    print(f"  {name:16} {value['seconds'] * 1000:10.1f} ms"
+                          f"  {value['peak_bytes'] / 1024 / 1024:8.1f} MB")
+
+    output = args.output or os.path.join("benchmark_results", f"{commit or 'resultado'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"Resultados gravados em {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Formatos do arquivo de tarefas
+
+- "pretty": JSON indentado (formato original, fácil de ler e editar)
+- "compact": JSON sem espaços, gerado pelo codificador em C do módulo json
+- "binary": cada tarefa vira uma tupla (id, texto, status, criação, prazo,
+  extras, subtarefas) gravada com msgpack, se instalado, ou com marshal
+
+O formato é escolhido em app_config.json ("data_format") e detectado
+automaticamente na leitura, então trocar a opção não exige conversão: o
+arquivo é regravado no novo formato na próxima gravação.
+
+Converter um arquivo manualmente:
+    python data_format.py tasks_data.json tasks_data.bin --format binary
+"""
+
+import argparse
+import gc
+import json
+import marshal
+from contextlib import contextmanager
+
+from task_model import Task, task_from_json, task_to_json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+FORMATS = ("pretty", "compact", "binary")
+
+# Início do arquivo binário, seguido de um byte com o codificador usado
+BINARY_MAGIC = b"TMGR"
+MSGPACK = b"M"
+MARSHAL = b"S"
+# Versão do formato do marshal (estável entre versões do Python 3)
+MARSHAL_VERSION = 4
+
+
+@contextmanager
+def paused_gc():
+    """Desligar o coletor de ciclos enquanto milhares de objetos são criados"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def task_to_row(task):
+    return (task.id, task.text, task.status, task.created_ts, task.deadline_ts,
+            task.ref_fields(), [task_to_row(subtask) for subtask in task.subtasks])
+
+
+def task_from_row(row):
+    task_id, text, status, created_ts, deadline_ts, extra, subtasks = row
+    return Task(task_id, text, status, created_ts, deadline_ts,
+                [task_from_row(subtask) for subtask in subtasks], extra)
+
+
+def encode(tasks, data_format="pretty"):
+    """Bytes do arquivo de tarefas no formato informado"""
+    with paused_gc():
+        return encode_tasks(tasks, data_format)
+
+
+def encode_tasks(tasks, data_format):
+    if data_format == "binary":
+        rows = [task_to_row(task) for task in tasks]
+        if msgpack is not None:
+            return BINARY_MAGIC + MSGPACK + msgpack.packb(rows, use_bin_type=True)
+        return BINARY_MAGIC + MARSHAL + marshal.dumps(rows, MARSHAL_VERSION)
+
+    if data_format == "compact":
+        text = json.dumps(tasks, ensure_ascii=False, separators=(",", ":"), default=task_to_json)
+    else:
+        text = json.dumps(tasks, indent=4, ensure_ascii=False, default=task_to_json)
+    return text.encode("utf-8")
+
+
+def decode(data):
+    """Tarefas do conteúdo do arquivo, detectando o formato"""
+    with paused_gc():
+        return decode_tasks(data)
+
+
+def decode_tasks(data):
+    if data.startswith(BINARY_MAGIC):
+        codec = data[len(BINARY_MAGIC):len(BINARY_MAGIC) + 1]
+        payload = data[len(BINARY_MAGIC) + 1:]
+        if codec == MSGPACK:
+            if msgpack is None:
+                raise ValueError("arquivo gravado com msgpack, que não está instalado")
+            rows = msgpack.unpackb(payload, raw=False)
+        elif codec == MARSHAL:
+            rows = marshal.loads(payload)
+        else:
+            raise ValueError(f"codificador binário desconhecido: {codec!r}")
+        return [task_from_row(row) for row in rows]
+
+    return json.loads(data.decode("utf-8"), object_hook=task_from_json)
+
+
+def detect_format(data):
+    """Formato do conteúdo ("pretty" para JSON com quebras de linha)"""
+    if data.startswith(BINARY_MAGIC):
+        return "binary"
+    return "pretty" if b"\n" in data[:4096] else "compact"
+
+
+def convert(source, target, data_format):
+    with open(source, 'rb') as f:
+        data = f.read()
+    tasks = decode(data)
+    with open(target, 'wb') as f:
+        f.write(encode(tasks, data_format))
+    return detect_format(data), len(tasks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converter o arquivo de tarefas entre formatos")
+    parser.add_argument("source")
+    parser.add_argument("target")
+    parser.add_argument("--format", choices=FORMATS, default="compact")
+    args = parser.parse_args()
+
+    source_format, count = convert(args.source, args.target, args.format)
+    print(f"{count} tarefa(s) raiz convertida(s) de {source_format} para {args.format}")
+
+
+if __name__ == "__main__":
+    main()
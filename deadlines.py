@@ -0,0 +1,165 @@
+"""
+Classificação dos prazos em faixas de dias
+
+Os dias restantes de uma tarefa só mudam na virada do dia, então cada
+tarefa guarda apenas o dia (ordinal) do seu prazo. As faixas (atrasada,
+hoje, até 3 dias, depois) são derivadas do dia atual, que só é avançado
+em `rollover`.
+
+A exceção são os prazos com hora: passam de "hoje" para atrasados na
+própria hora, quando `expire` é chamado.
+"""
+
+import time
+from datetime import date
+from functools import lru_cache
+
+OVERDUE = "overdue"
+TODAY = "today"
+SOON = "soon"
+LATER = "later"
+
+# Até quantos dias o prazo é considerado próximo (urgente)
+SOON_DAYS = 3
+
+
+def bucket_for(days_left):
+    if days_left < 0:
+        return OVERDUE
+    if days_left == 0:
+        return TODAY
+    if days_left <= SOON_DAYS:
+        return SOON
+    return LATER
+
+
+@lru_cache(maxsize=1024)
+def row_label(days_left, expired=False):
+    """(texto da coluna "Dias Restantes", tag de cor) para a árvore"""
+    if days_left is None:
+        return ("—", "normal")
+    if expired:
+        return ("❌ Atrasado (hoje)", "overdue")
+    if days_left < 0:
+        return (f"❌ Atrasado ({abs(days_left)}d)", "overdue")
+    if days_left == 0:
+        return ("⚠️ Hoje!", "urgent")
+    if days_left <= SOON_DAYS:
+        return (f"⚠️ {days_left} dias", "urgent")
+    return (f"✓ {days_left} dias", "normal")
+
+
+class DeadlineClassifier:
+    """Dia do prazo de cada tarefa, agrupado por dia, para a árvore e o notificador"""
+
+    def __init__(self, today=None):
+        self.today = (today or date.today()).toordinal()
+        # id da tarefa -> ordinal do dia do prazo
+        self.deadline_days = {}
+        # ordinal do dia -> ids com prazo nesse dia
+        self.by_day = {}
+        # id -> timestamp dos prazos com hora
+        self.timed = {}
+        # Prazos com hora de hoje cuja hora já passou
+        self.expired = set()
+
+    def clear(self):
+        self.deadline_days.clear()
+        self.by_day.clear()
+        self.timed.clear()
+        self.expired.clear()
+
+    def track(self, task):
+        """(Re)registrar o prazo de uma tarefa"""
+        self.untrack(task.id)
+        if task.deadline_ts is None:
+            return
+        day = date.fromtimestamp(task.deadline_ts).toordinal()
+        self.deadline_days[task.id] = day
+        self.by_day.setdefault(day, set()).add(task.id)
+        if task.deadline_time:
+            self.timed[task.id] = task.deadline_ts
+            if day == self.today and task.deadline_ts <= time.time():
+                self.expired.add(task.id)
+
+    def untrack(self, task_id):
+        self.timed.pop(task_id, None)
+        self.expired.discard(task_id)
+        day = self.deadline_days.pop(task_id, None)
+        if day is not None:
+            ids = self.by_day[day]
+            ids.discard(task_id)
+            if not ids:
+                del self.by_day[day]
+
+    def track_tree(self, task):
+        stack = [task]
+        while stack:
+            node = stack.pop()
+            self.track(node)
+            stack.extend(node.subtasks)
+
+    def untrack_tree(self, task):
+        stack = [task]
+        while stack:
+            node = stack.pop()
+            self.untrack(node.id)
+            stack.extend(node.subtasks)
+
+    def deadline_day(self, task_id):
+        """Ordinal do dia do prazo, ou None se a tarefa não tem prazo"""
+        return self.deadline_days.get(task_id)
+
+    def days_left(self, task_id, today=None):
+        """Dias até o prazo em relação ao dia atual (ou a `today`, se informado)"""
+        day = self.deadline_days.get(task_id)
+        if day is None:
+            return None
+        return day - (today.toordinal() if today else self.today)
+
+    def is_expired(self, task_id):
+        """O prazo é hoje, com hora, e a hora já passou?"""
+        return task_id in self.expired
+
+    def bucket(self, task_id):
+        days_left = self.days_left(task_id)
+        if days_left is None:
+            return None
+        return OVERDUE if task_id in self.expired else bucket_for(days_left)
+
+    def bucket_ids(self, bucket):
+        """Ids das tarefas em uma faixa (percorre só os dias distintos de prazo)"""
+        ids = set()
+        for day, day_ids in self.by_day.items():
+            if bucket_for(day - self.today) == bucket:
+                ids |= day_ids
+        if bucket == OVERDUE:
+            ids |= self.expired
+        elif bucket == TODAY:
+            ids -= self.expired
+        return ids
+
+    def expire(self, now=None):
+        """Marcar os prazos com hora de hoje que já passaram; retorna os ids
+        que acabaram de ficar atrasados"""
+        now = now or time.time()
+        changed = {task_id for task_id in self.by_day.get(self.today, ())
+                   if task_id not in self.expired and self.timed.get(task_id, now + 1) <= now}
+        self.expired |= changed
+        return changed
+
+    def rollover(self, today=None):
+        """Avançar o dia atual; retorna os ids que mudaram de faixa"""
+        new_today = (today or date.today()).toordinal()
+        changed = set()
+
+        for day in range(self.today + 1, new_today + 1):
+            # Dias em que a faixa muda: hoje -> atrasada, próxima -> hoje, depois -> próxima
+            for boundary in (day - 1, day, day + SOON_DAYS):
+                changed |= self.by_day.get(boundary, set())
+
+        if new_today > self.today:
+            # Os de ontem agora estão atrasados pelo dia (já em `changed`)
+            self.expired.clear()
+        self.today = max(self.today, new_today)
+        return changed
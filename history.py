@@ -0,0 +1,163 @@
+"""
+Histórico para desfazer/refazer (Ctrl+Z / Ctrl+Y)
+
+O histórico escuta os eventos do TaskEngine e guarda, para cada alteração,
+somente o estado antes e depois da parte alterada:
+
+- "added"/"deleted": a própria tarefa (com subtarefas) e (pai, posição)
+- "updated": os valores anteriores e novos dos campos alterados
+- "moved": (pai, posição) de origem e de destino
+
+Desfazer aplica o estado "antes" pelas mesmas operações do engine (excluir,
+reinserir, alterar campos, mover), então só a tarefa afetada é gravada e
+redesenhada na árvore. Alterações feitas dentro de `group()` (ações em lote)
+viram uma única entrada, desfeita em uma única gravação.
+
+O histórico é limitado em entradas e no total de tarefas guardadas (tarefas
+excluídas ocupam memória enquanto podem ser restauradas); as entradas mais
+antigas são descartadas primeiro.
+"""
+
+from collections import deque
+from contextlib import contextmanager
+
+from task_model import Task, count_tasks
+
+
+class History:
+    def __init__(self, engine, max_steps=100, max_tasks=10000):
+        self.engine = engine
+        self.max_steps = max_steps
+        self.max_tasks = max_tasks
+        # Entradas (alterações, peso); o peso é o número de tarefas guardadas
+        self.undo_stack = deque()
+        self.redo_stack = deque()
+        self.weight = 0
+        # Alterações do grupo aberto em group() (None fora dele)
+        self.group_changes = None
+        # Ligado enquanto o próprio histórico altera o engine
+        self.replaying = False
+        engine.subscribe(self.on_task_event)
+
+    def on_task_event(self, event, task, parent_id, **details):
+        """Registrar a alteração como (evento, tarefa ou id, antes, depois)"""
+        if self.replaying or details.get("archived") or details.get("external"):
+            # Arquivar, restaurar do arquivo e alterações de outro processo
+            # não entram no histórico
+            return
+
+        if event == "added":
+            change = (event, task, None, (parent_id, details.get("index")))
+        elif event == "deleted":
+            # A tarefa excluída fica guardada aqui, fora do arquivo de textos
+            self.engine.detach_texts(task)
+            change = (event, task, (parent_id, details.get("index")), None)
+        elif event == "updated" and "previous" in details:
+            previous = details["previous"]
+            current = {name: task.full_text() if name == "text" else getattr(task, name)
+                       for name in previous}
+            change = (event, task.id, previous, current)
+        elif event == "moved":
+            change = (event, task.id, (details.get("old_parent_id"), details.get("old_index")),
+                      (parent_id, details.get("index")))
+        else:
+            return
+
+        if self.group_changes is not None:
+            self.group_changes.append(change)
+        else:
+            self.push([change])
+
+    @contextmanager
+    def group(self):
+        """Registrar tudo o que for alterado no bloco como uma única entrada
+        (e gravar no backend de uma só vez)"""
+        if self.group_changes is not None:
+            yield
+            return
+
+        self.group_changes = []
+        try:
+            with self.engine.batch():
+                yield
+        finally:
+            changes, self.group_changes = self.group_changes, None
+            if changes:
+                self.push(changes)
+
+    def push(self, changes):
+        """Nova entrada: o que podia ser refeito deixa de valer"""
+        while self.redo_stack:
+            self.weight -= self.redo_stack.pop()[1]
+
+        weight = sum(self.weight_of(change) for change in changes)
+        self.undo_stack.append((changes, weight))
+        self.weight += weight
+        self.trim()
+
+    def weight_of(self, change):
+        subject = change[1]
+        if isinstance(subject, Task):
+            return sum(count_tasks([subject]).values())
+        return 1
+
+    def trim(self):
+        """Descartar as entradas mais antigas acima dos limites (a última fica sempre)"""
+        while len(self.undo_stack) > 1 and (
+            len(self.undo_stack) + len(self.redo_stack) > self.max_steps
+            or self.weight > self.max_tasks
+        ):
+            self.weight -= self.undo_stack.popleft()[1]
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self):
+        """Desfazer a última entrada; retorna False se não havia o que desfazer"""
+        if not self.undo_stack:
+            return False
+        entry = self.undo_stack.pop()
+        self.replay(entry[0], undo=True)
+        self.redo_stack.append(entry)
+        return True
+
+    def redo(self):
+        if not self.redo_stack:
+            return False
+        entry = self.redo_stack.pop()
+        self.replay(entry[0], undo=False)
+        self.undo_stack.append(entry)
+        return True
+
+    def replay(self, changes, undo):
+        self.replaying = True
+        try:
+            with self.engine.batch():
+                for change in (reversed(changes) if undo else changes):
+                    self.apply(change, undo)
+        finally:
+            self.replaying = False
+
+    def apply(self, change, undo):
+        """Levar a parte alterada para o estado antes (undo) ou depois (redo)"""
+        event, subject, before, after = change
+        state = before if undo else after
+
+        if event in ("added", "deleted"):
+            if state is None:
+                self.engine.delete_task(subject.id)
+                self.engine.detach_texts(subject)
+            else:
+                self.engine.insert_task(subject, *state)
+        elif event == "updated":
+            self.engine.update_fields(subject, state)
+        elif event == "moved":
+            self.engine.move_task(subject, *state)
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.weight = 0
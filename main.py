@@ -7,13 +7,107 @@ import tkinter as tk
 from tkinter import messagebox, colorchooser
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-from ttkbootstrap.dialogs import Messagebox
+from ttkbootstrap.dialogs import Messagebox, Querybox
+from ttkbootstrap.style import ThemeDefinition
 import json
 import os
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from plyer import notification
-import threading
 import time
+import threading
+from storage import BackgroundWriter, create_storage
+from notifications import DeadlineScheduler, NotificationDispatcher, midnight_of, reminder_for
+from deadlines import row_label
+from task_engine import TaskEngine
+from archive import TaskArchive, archive_path
+from history import History
+from recurrence import FREQUENCIES, describe, make_rule, rule_of
+
+# Quantidade de tarefas raiz inseridas na árvore por vez
+TREE_PAGE_SIZE = 200
+
+# Distância (em pixels) que o mouse precisa percorrer para começar a arrastar
+DRAG_THRESHOLD = 5
+
+# Máximo de tarefas encontradas exibidas na árvore durante uma busca
+MAX_SEARCH_RESULTS = 500
+
+# Cores do tema "purple-dark" (registrado como um tema do ttkbootstrap)
+PURPLE_THEME_COLORS = {
+    'primary': '#9c27b0',
+    'secondary': '#7b1fa2',
+    'success': '#66bb6a',
+    'info': '#ba68c8',
+    'warning': '#ffa726',
+    'danger': '#ef5350',
+    'light': '#e0e0e0',
+    'dark': '#1a1a1a',
+    'bg': '#0d0d0d',
+    'fg': '#e0e0e0',
+    'selectbg': '#7b1fa2',
+    'selectfg': '#ffffff',
+    'border': '#9c27b0',
+    'inputfg': '#e0e0e0',
+    'inputbg': '#1a1a1a',
+    'active': '#2a1a2e'
+}
+
+
+def blend_colors(color, background, weight):
+    """Misturar duas cores "#rrggbb" (weight = proporção de `color`)"""
+    mixed = [
+        round(int(color[i:i + 2], 16) * weight + int(background[i:i + 2], 16) * (1 - weight))
+        for i in (1, 3, 5)
+    ]
+    return "#" + "".join(f"{channel:02x}" for channel in mixed)
+
+
+def read_deadline(day, month, year, time_text=""):
+    """(prazo, hora informada?) a partir dos campos do formulário; a hora
+    ("HH:MM") é opcional. Lança ValueError se a data ou a hora forem inválidas."""
+    deadline = datetime(int(year), int(month), int(day))
+    if not time_text.strip():
+        return deadline, False
+    hour, minute = time_text.strip().split(":")
+    return deadline.replace(hour=int(hour), minute=int(minute)), True
+
+
+def deadline_passed(deadline, timed):
+    """Um prazo sem hora vale até o fim do dia, então hoje é aceito"""
+    if not timed:
+        return deadline.date() < date.today()
+    return deadline <= datetime.now()
+
+
+def deadline_label(task):
+    """Prazo para exibição: data e, se houver, hora"""
+    if not task.deadline:
+        return "—"
+    return f"{task.deadline} {task.deadline_time}" if task.deadline_time else task.deadline
+
+
+# Título de cada coluna da árvore (o cabeçalho ganha ▲/▼ quando ordenado)
+COLUMN_HEADINGS = {
+    "Status": "Status",
+    "Prazo": "⏰ Data Limite",
+    "Criada": "📅 Criada em",
+    "Dias Restantes": "⏳ Dias Restantes",
+}
+
+# Chave de ordenação de cada coluna: os timestamps numéricos da tarefa, não
+# o texto DD/MM/AAAA exibido. Tarefas sem prazo ficam no fim.
+SORT_KEYS = {
+    "Status": lambda task: task.status == "Concluída",
+    "Prazo": lambda task: task.deadline_ts if task.deadline_ts is not None else float("inf"),
+    "Criada": lambda task: task.created_ts or 0,
+    "Dias Restantes": lambda task: task.deadline_ts if task.deadline_ts is not None else float("inf"),
+}
+
+# Filtros de status: texto do botão -> status exigido na subárvore
+STATUS_FILTERS = {"Todas": "", "Pendentes": "Pendente", "Concluídas": "Concluída"}
+
+# Filtros de prazo: texto do botão -> máximo de dias até o prazo pendente mais próximo
+DUE_FILTERS = {"Qualquer prazo": "", "Atrasadas": "-1", "Até hoje": "0", "Próximos 7 dias": "7"}
 
 class TaskManagerApp:
     def __init__(self, root):
@@ -21,18 +115,52 @@ class TaskManagerApp:
         self.root.title("Gerenciador de Tarefas Pro")
         self.root.geometry("1400x800")  # Aumentado para melhor visualização
         
-        # Variável para rastrear último dia checado
-        self.last_check_day = datetime.now().date()
-        
-        # Thread de notificações
-        self.notification_thread = None
-        self.stop_notifications = False
-        
         # Carregar dados e configurações
         self.data_file = "tasks_data.json"
         self.config_file = "app_config.json"
-        self.tasks = self.load_data()
         self.config = self.load_config()
+        self.notifier = NotificationDispatcher(
+            self.display_notification,
+            rate_per_minute=self.config.get("notifications_per_minute", 6)
+        )
+        
+        # Tarefas, índices e persistência ficam no TaskEngine; a gravação
+        # roda em outra thread, protegida pelo lock das tarefas
+        lock = threading.RLock()
+        storage = BackgroundWriter(
+            lambda: create_storage(
+                self.config.get("storage", "json"),
+                self.data_file,
+                max_log_bytes=self.config.get("journal_max_bytes", 1024 * 1024),
+                data_format=self.config.get("data_format", "pretty"),
+                text_store=self.config.get("text_store")
+            ),
+            lock,
+            delay=self.config.get("save_delay_ms", 500) / 1000
+        )
+        archive = TaskArchive(archive_path(self.data_file),
+                              data_format=self.config.get("data_format", "pretty"))
+        self.engine = TaskEngine(storage, lock, archive)
+        self.engine.subscribe(self.on_task_event)
+        
+        # Agendador de notificações de prazo, alimentado pelos eventos do engine
+        self.scheduler = DeadlineScheduler(
+            self.notify_deadline,
+            self.engine.deadlines,
+            lead_minutes=self.config.get("reminder_lead_minutes", [60, 15]),
+            daily_hour=self.config.get("daily_reminder_hour", 9)
+        )
+        self.engine.subscribe(self.scheduler.on_task_event)
+        
+        # Desfazer/refazer (Ctrl+Z / Ctrl+Y)
+        self.history = History(
+            self.engine,
+            max_steps=self.config.get("undo_max_steps", 100),
+            max_tasks=self.config.get("undo_max_tasks", 10000)
+        )
+        
+        # As tarefas são carregadas em segundo plano (ver start_loading)
+        self.data_loaded = False
         
         # Validar tema
         valid_themes = ["darkly", "solar", "superhero", "cyborg", "vapor", 
@@ -46,35 +174,49 @@ class TaskManagerApp:
             self.current_theme = "darkly"
         
         # Aplicar tema
-        if self.current_theme == "purple-dark":
-            self.style = ttk.Style(theme="darkly")
-        else:
-            self.style = ttk.Style(theme=self.current_theme)
+        self.style = ttk.Style()
+        self.style.register_theme(ThemeDefinition("purple-dark", PURPLE_THEME_COLORS, "dark"))
+        self.style.theme_use(self.current_theme)
         
         # Criar interface
         self.create_menu()
         self.create_widgets()
         self.apply_custom_styles()
-        self.refresh_tree()
         
-        # Iniciar thread de notificações
-        self.start_notification_service()
+        # Abrir a janela já e carregar as tarefas fora da thread da interface
+        self.start_loading()
         
         # Protocolo de fechamento
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
     
-    def load_data(self):
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return []
-        return []
+    def start_loading(self):
+        self.task_count_label.config(text="⏳ Carregando tarefas...")
+        self.add_btn.config(state=DISABLED)
+        self.load_thread = threading.Thread(target=self.load_tasks, daemon=True)
+        self.load_thread.start()
+        self.root.after(50, self.check_loading)
     
-    def save_data(self):
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump(self.tasks, f, indent=4, ensure_ascii=False)
+    def load_tasks(self):
+        """Carregar as tarefas e arquivar as concluídas antigas (roda fora da thread da interface)"""
+        self.engine.load()
+        days = self.config.get("archive_after_days", 30)
+        if days:
+            self.engine.archive_completed(days)
+    
+    def check_loading(self):
+        if self.load_thread.is_alive():
+            self.root.after(50, self.check_loading)
+            return
+        
+        self.data_loaded = True
+        self.add_btn.config(state=NORMAL)
+        self.refresh_tree()
+        self.schedule_day_rollover()
+        self.schedule_deadline_check()
+        self.schedule_external_check()
+        
+        # Iniciar thread de notificações
+        self.start_notification_service()
     
     def load_config(self):
         if os.path.exists(self.config_file):
@@ -104,8 +246,22 @@ class TaskManagerApp:
         # Menu Arquivo
         file_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="📁 Arquivo", menu=file_menu)
+        file_menu.add_command(label="📦 Ver arquivo", command=self.show_archive)
+        file_menu.add_command(label="Arquivar concluídas agora", command=self.archive_now)
+        file_menu.add_separator()
         file_menu.add_command(label="Sair", command=self.on_closing)
         
+        # Menu Editar
+        edit_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="✏️ Editar", menu=edit_menu)
+        edit_menu.add_command(label="Desfazer", accelerator="Ctrl+Z", command=self.undo)
+        edit_menu.add_command(label="Refazer", accelerator="Ctrl+Y", command=self.redo)
+        
+        for sequence in ("<Control-z>", "<Control-Z>"):
+            self.root.bind(sequence, lambda e: self.undo(e))
+        for sequence in ("<Control-y>", "<Control-Y>"):
+            self.root.bind(sequence, lambda e: self.redo(e))
+        
         # Menu Temas
         theme_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="🎨 Temas", menu=theme_menu)
@@ -135,7 +291,7 @@ class TaskManagerApp:
         
         theme_menu.add_separator()
         theme_menu.add_command(label="🟣 Roxo Escuro (Personalizado)", 
-                              command=lambda: self.apply_purple_theme())
+                              command=lambda: self.change_theme("purple-dark"))
         
         # Menu Visualização
         view_menu = tk.Menu(menubar, tearoff=0)
@@ -216,6 +372,11 @@ class TaskManagerApp:
         ttk.Label(date_frame, text="/").pack(side=LEFT)
         ttk.Entry(date_frame, textvariable=self.year_var, width=5).pack(side=LEFT, padx=2)
         
+        # Hora opcional (HH:MM); vazia = prazo só com a data
+        self.time_var = tk.StringVar()
+        ttk.Label(date_frame, text="às").pack(side=LEFT, padx=(6, 0))
+        ttk.Entry(date_frame, textvariable=self.time_var, width=6).pack(side=LEFT, padx=2)
+        
         self.add_btn = ttk.Button(
             input_grid,
             text="✚ Adicionar",
@@ -225,6 +386,12 @@ class TaskManagerApp:
         )
         self.add_btn.grid(row=0, column=4, padx=10, pady=5)
         
+        ttk.Label(input_grid, text="Repetir:", font=("Segoe UI", 10, "bold")).grid(
+            row=1, column=2, sticky=W, pady=5, padx=(20, 0)
+        )
+        recurrence_frame, self.read_recurrence = self.create_recurrence_input(input_grid)
+        recurrence_frame.grid(row=1, column=3, padx=10, pady=5, sticky=W)
+        
         input_grid.columnconfigure(1, weight=1)
         
         # Dica de uso
@@ -245,6 +412,40 @@ class TaskManagerApp:
         )
         tree_card.pack(fill=BOTH, expand=YES)
         
+        # Barra de busca
+        search_frame = ttk.Frame(tree_card)
+        search_frame.pack(fill=X, pady=(0, 10))
+        
+        ttk.Label(search_frame, text="🔍 Buscar:", font=("Segoe UI", 10, "bold")).pack(side=LEFT)
+        
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", lambda *args: self.schedule_search())
+        ttk.Entry(search_frame, textvariable=self.search_var).pack(
+            side=LEFT, fill=X, expand=YES, padx=10
+        )
+        
+        self.search_result_label = ttk.Label(search_frame, text="", bootstyle="secondary")
+        self.search_result_label.pack(side=LEFT)
+        
+        # Filtros de status e de prazo
+        filter_frame = ttk.Frame(tree_card)
+        filter_frame.pack(fill=X, pady=(0, 10))
+        
+        self.status_filter_var = tk.StringVar(value="")
+        self.due_filter_var = tk.StringVar(value="")
+        for filters, variable in ((STATUS_FILTERS, self.status_filter_var),
+                                  (DUE_FILTERS, self.due_filter_var)):
+            for label, value in filters.items():
+                ttk.Radiobutton(
+                    filter_frame,
+                    text=label,
+                    value=value,
+                    variable=variable,
+                    command=self.apply_filters,
+                    bootstyle="info-toolbutton"
+                ).pack(side=LEFT, padx=2)
+            ttk.Separator(filter_frame, orient=VERTICAL).pack(side=LEFT, fill=Y, padx=10)
+        
         # Container do Treeview
         tree_container = ttk.Frame(tree_card)
         tree_container.pack(fill=BOTH, expand=YES)
@@ -252,6 +453,7 @@ class TaskManagerApp:
         # Scrollbars
         vsb = ttk.Scrollbar(tree_container, orient=VERTICAL, bootstyle="primary-round")
         vsb.pack(side=RIGHT, fill=Y)
+        self.tree_vsb = vsb
         
         hsb = ttk.Scrollbar(tree_container, orient=HORIZONTAL, bootstyle="primary-round")
         hsb.pack(side=BOTTOM, fill=X)
@@ -260,9 +462,10 @@ class TaskManagerApp:
         self.tree = ttk.Treeview(
             tree_container,
             columns=("Status", "Prazo", "Criada", "Dias Restantes"),
-            yscrollcommand=vsb.set,
+            yscrollcommand=self.on_tree_scroll,
             xscrollcommand=hsb.set,
             bootstyle="primary",
+            selectmode="extended",  # Ctrl/Shift+clique para selecionar várias
             height=15
         )
         
@@ -270,10 +473,10 @@ class TaskManagerApp:
         hsb.config(command=self.tree.xview)
         
         self.tree.heading("#0", text="📌 Tarefa (Duplo clique para detalhes)")
-        self.tree.heading("Status", text="Status")
-        self.tree.heading("Prazo", text="⏰ Data Limite")
-        self.tree.heading("Criada", text="📅 Criada em")
-        self.tree.heading("Dias Restantes", text="⏳ Dias Restantes")
+        # Clique no cabeçalho: ordem crescente, decrescente e de volta à original
+        for column, heading in COLUMN_HEADINGS.items():
+            self.tree.heading(column, text=heading,
+                              command=lambda column=column: self.sort_by(column))
         
         # Aumentar largura da coluna de tarefa
         self.tree.column("#0", width=600, minwidth=300)
@@ -284,8 +487,21 @@ class TaskManagerApp:
         
         self.tree.pack(fill=BOTH, expand=YES)
         
+        # Configurar tags (uma vez; a troca de tema só muda as cores)
+        self.apply_tag_colors()
+        
+        self.reset_view()
+        
         # Bind duplo clique para mostrar detalhes
         self.tree.bind('<Double-1>', lambda e: self.show_task_details())
+        self.tree.bind('<<TreeviewOpen>>', self.on_tree_open)
+        
+        # Arrastar e soltar: reordenar irmãos ou mover para dentro de outra tarefa
+        self.drag_item = None
+        self.dragging = False
+        self.tree.bind('<ButtonPress-1>', self.on_drag_start, add="+")
+        self.tree.bind('<B1-Motion>', self.on_drag_motion, add="+")
+        self.tree.bind('<ButtonRelease-1>', self.on_drop, add="+")
         
         # Frame de botões com estilo moderno
         btn_card = ttk.Frame(main_container)
@@ -330,6 +546,15 @@ class TaskManagerApp:
         )
         self.delete_btn.pack(side=LEFT, padx=5)
         
+        self.postpone_btn = ttk.Button(
+            btn_left,
+            text="📅 Adiar",
+            command=self.postpone_tasks,
+            bootstyle="secondary-outline",
+            width=15
+        )
+        self.postpone_btn.pack(side=LEFT, padx=5)
+        
         # Botões à direita
         btn_right = ttk.Frame(btn_card)
         btn_right.pack(side=RIGHT)
@@ -360,7 +585,7 @@ class TaskManagerApp:
             return
         
         item_id = selected[0]
-        task = self.find_task_by_id(item_id)
+        task = self.engine.find_task_by_id(item_id)
         
         if not task:
             return
@@ -403,7 +628,7 @@ class TaskManagerApp:
         text_scroll.config(command=text_widget.yview)
         
         # Inserir texto da tarefa
-        text_widget.insert("1.0", task["text"])
+        text_widget.insert("1.0", task.full_text())
         text_widget.config(state=tk.DISABLED)
         
         # Informações adicionais
@@ -411,13 +636,14 @@ class TaskManagerApp:
         info_frame.pack(fill=X, pady=(0, 10))
         
         # Calcular dias restantes
-        if "deadline_timestamp" in task:
-            deadline = datetime.fromtimestamp(task["deadline_timestamp"])
-            days_left = (deadline - datetime.now()).days
-            
+        days_left = self.engine.deadlines.days_left(task.id)
+        if days_left is not None:
             if days_left < 0:
                 days_info = f"❌ Atrasado há {abs(days_left)} dia(s)"
                 days_color = "danger"
+            elif self.engine.deadlines.is_expired(task.id):
+                days_info = f"❌ Prazo vencido hoje às {task.deadline_time}"
+                days_color = "danger"
             elif days_left == 0:
                 days_info = "⚠️ PRAZO HOJE!"
                 days_color = "warning"
@@ -431,15 +657,18 @@ class TaskManagerApp:
             days_info = "Sem prazo definido"
             days_color = "secondary"
         
-        status_icon = "✅" if task["status"] == "Concluída" else "⏳"
-        status_color = "success" if task["status"] == "Concluída" else "warning"
+        status_icon = "✅" if task.status == "Concluída" else "⏳"
+        status_color = "success" if task.status == "Concluída" else "warning"
         
         info_labels = [
-            ("📊 Status:", f"{status_icon} {task['status']}", status_color),
-            ("📅 Criada em:", task["created"], "info"),
-            ("⏰ Prazo:", task.get("deadline", "—"), "primary"),
+            ("📊 Status:", f"{status_icon} {task.status}", status_color),
+            ("📅 Criada em:", task.created, "info"),
+            ("⏰ Prazo:", deadline_label(task), "primary"),
             ("⏳ Tempo restante:", days_info, days_color)
         ]
+        rule = rule_of(task)
+        if rule:
+            info_labels.append(("🔁 Repetição:", describe(rule), "info"))
         
         for i, (label, value, color) in enumerate(info_labels):
             row_frame = ttk.Frame(info_frame)
@@ -460,13 +689,13 @@ class TaskManagerApp:
             ).pack(side=LEFT)
         
         # Subtarefas
-        if task.get("subtasks"):
-            subtask_frame = ttk.LabelFrame(main_frame, text=f"📌 Subtarefas ({len(task['subtasks'])})", padding=10)
+        if task.subtasks:
+            subtask_frame = ttk.LabelFrame(main_frame, text=f"📌 Subtarefas ({len(task.subtasks)})", padding=10)
             subtask_frame.pack(fill=X)
             
-            for i, subtask in enumerate(task["subtasks"][:5], 1):  # Mostrar até 5
-                status_icon = "✅" if subtask["status"] == "Concluída" else "⏳"
-                subtask_text = subtask["text"][:80] + "..." if len(subtask["text"]) > 80 else subtask["text"]
+            for i, subtask in enumerate(task.subtasks[:5], 1):  # Mostrar até 5
+                status_icon = "✅" if subtask.status == "Concluída" else "⏳"
+                subtask_text = subtask.text[:80] + "..." if len(subtask.text) > 80 else subtask.text
                 
                 ttk.Label(
                     subtask_frame,
@@ -474,10 +703,10 @@ class TaskManagerApp:
                     font=("Segoe UI", 9)
                 ).pack(anchor=W, pady=2)
             
-            if len(task["subtasks"]) > 5:
+            if len(task.subtasks) > 5:
                 ttk.Label(
                     subtask_frame,
-                    text=f"... e mais {len(task['subtasks']) - 5} subtarefa(s)",
+                    text=f"... e mais {len(task.subtasks) - 5} subtarefa(s)",
                     font=("Segoe UI", 9, "italic"),
                     bootstyle="secondary"
                 ).pack(anchor=W, pady=2)
@@ -502,96 +731,134 @@ class TaskManagerApp:
             width=15
         ).pack(side=RIGHT, padx=5)
     
-    def show_notification(self, title, message, timeout=10):
-        """Exibir notificação do Windows"""
-        try:
-            notification.notify(
-                title=title,
-                message=message,
-                app_name="Gerenciador de Tarefas Pro",
-                timeout=timeout
-            )
-        except Exception as e:
-            print(f"Erro ao exibir notificação: {e}")
+    def show_archive(self):
+        """Janela com as tarefas arquivadas (o arquivo só é lido aqui)"""
+        archived = self.engine.archive.load()
+        
+        archive_window = tk.Toplevel(self.root)
+        archive_window.title("📦 Tarefas Arquivadas")
+        archive_window.geometry("900x500")
+        
+        main_frame = ttk.Frame(archive_window, padding=20)
+        main_frame.pack(fill=BOTH, expand=YES)
+        
+        ttk.Label(
+            main_frame,
+            text=f"{len(archived)} tarefa(s) arquivada(s)",
+            font=("Segoe UI", 12, "bold"),
+            bootstyle="primary"
+        ).pack(anchor=W, pady=(0, 10))
+        
+        tree_frame = ttk.Frame(main_frame)
+        tree_frame.pack(fill=BOTH, expand=YES)
+        
+        archive_tree = ttk.Treeview(
+            tree_frame,
+            columns=("Prazo", "Criado", "Subtarefas"),
+            bootstyle="primary"
+        )
+        archive_tree.heading("#0", text="📝 Tarefa", anchor=W)
+        archive_tree.heading("Prazo", text="⏰ Prazo", anchor=CENTER)
+        archive_tree.heading("Criado", text="📅 Criado em", anchor=CENTER)
+        archive_tree.heading("Subtarefas", text="📌 Subtarefas", anchor=CENTER)
+        archive_tree.column("#0", width=450, minwidth=200)
+        archive_tree.column("Prazo", width=120, anchor=CENTER)
+        archive_tree.column("Criado", width=150, anchor=CENTER)
+        archive_tree.column("Subtarefas", width=100, anchor=CENTER)
+        
+        archive_vsb = ttk.Scrollbar(tree_frame, orient=VERTICAL, command=archive_tree.yview)
+        archive_tree.configure(yscrollcommand=archive_vsb.set)
+        archive_tree.pack(side=LEFT, fill=BOTH, expand=YES)
+        archive_vsb.pack(side=RIGHT, fill=Y)
+        
+        for task in archived:
+            display_text = task.text[:150] + "..." if len(task.text) > 150 else task.text
+            archive_tree.insert("", tk.END, task.id, text=f"✅ {display_text}",
+                                values=(task.deadline or "—", task.created, len(task.subtasks)))
+        
+        def restore():
+            selected = archive_tree.selection()
+            if not selected:
+                Messagebox.show_warning("Selecione uma tarefa!", "Aviso")
+                return
+            if self.engine.restore_archived(selected[0]):
+                archive_tree.delete(selected[0])
+        
+        btn_frame = ttk.Frame(main_frame)
+        btn_frame.pack(fill=X, pady=(15, 0))
+        
+        ttk.Button(btn_frame, text="↩️ Restaurar", command=restore,
+                  bootstyle="success", width=15).pack(side=LEFT, padx=5)
+        ttk.Button(btn_frame, text="✕ Fechar", command=archive_window.destroy,
+                  bootstyle="secondary", width=15).pack(side=RIGHT, padx=5)
+    
+    def archive_now(self):
+        if not self.data_loaded:
+            return
+        
+        days = self.config.get("archive_after_days", 30)
+        archived = self.engine.archive_completed(days)
+        Messagebox.show_info(
+            f"{len(archived)} tarefa(s) concluída(s) há mais de {days} dia(s) arquivada(s).",
+            "Arquivo"
+        )
+    
+    def show_notification(self, title, message, timeout=10, key=None, category=None):
+        """Enviar notificação pela fila do despachante (não bloqueia)"""
+        self.notifier.submit(title, message, timeout, key=key, category=category)
+    
+    def display_notification(self, title, message, timeout=10):
+        """Exibir notificação do Windows (chamado pela thread do despachante)"""
+        notification.notify(
+            title=title,
+            message=message,
+            app_name="Gerenciador de Tarefas Pro",
+            timeout=timeout
+        )
     
     def apply_custom_styles(self):
         """Aplicar estilos personalizados adicionais"""
         self.style.configure('Treeview', rowheight=35, font=("Segoe UI", 10))
         self.style.configure('Treeview.Heading', font=("Segoe UI", 10, "bold"))
     
-    def apply_purple_theme(self):
-        """Aplicar tema roxo e preto personalizado"""
-        self.style = ttk.Style()
-        
-        colors = {
-            'primary': '#9c27b0',
-            'secondary': '#7b1fa2',
-            'success': '#66bb6a',
-            'info': '#ba68c8',
-            'warning': '#ffa726',
-            'danger': '#ef5350',
-            'bg': '#0d0d0d',
-            'fg': '#e0e0e0',
-            'selectbg': '#7b1fa2',
-            'selectfg': '#ffffff',
-            'border': '#9c27b0',
-            'inputbg': '#1a1a1a',
-            'inputfg': '#e0e0e0'
-        }
-        
-        self.root.configure(bg=colors['bg'])
-        self.style = ttk.Style(theme='darkly')
-        self.style.configure('.', background=colors['bg'], foreground=colors['fg'])
-        self.style.configure('TFrame', background=colors['bg'])
-        self.style.configure('TLabel', background=colors['bg'], foreground=colors['fg'])
-        self.style.configure('TButton', borderwidth=2, relief='flat')
-        
-        self.current_theme = "purple-dark"
-        self.config["theme"] = "purple-dark"
-        self.save_config()
-        
-        Messagebox.show_info("Tema Roxo Escuro aplicado com sucesso!", "Tema Aplicado")
+    def apply_tag_colors(self):
+        """Cores das tags da árvore derivadas das cores do tema atual"""
+        colors = self.style.colors
+        self.tree.tag_configure("concluída", foreground=colors.success)
+        self.tree.tag_configure("pendente", foreground=colors.warning)
+        self.tree.tag_configure("overdue", background=blend_colors(colors.danger, colors.bg, 0.2))
+        self.tree.tag_configure("urgent", background=blend_colors(colors.warning, colors.bg, 0.15))
     
     def add_task(self):
+        if not self.data_loaded:
+            return
+        
         task_text = self.task_entry.get("1.0", tk.END).strip()
         if not task_text:
             Messagebox.show_warning("Digite uma tarefa!", "Aviso")
             return
         
         try:
-            day = int(self.day_var.get())
-            month = int(self.month_var.get())
-            year = int(self.year_var.get())
-            deadline = datetime(year, month, day)
-            
-            if deadline < datetime.now():
-                Messagebox.show_warning("A data limite deve ser futura!", "Data Inválida")
-                return
-                
+            deadline, timed = read_deadline(self.day_var.get(), self.month_var.get(),
+                                            self.year_var.get(), self.time_var.get())
         except ValueError:
-            Messagebox.show_warning("Data inválida! Use o formato DD/MM/AAAA", "Erro de Data")
+            Messagebox.show_warning("Data inválida! Use o formato DD/MM/AAAA e HH:MM", "Erro de Data")
             return
         
-        task = {
-            "id": self.generate_id(),
-            "text": task_text,
-            "status": "Pendente",
-            "created": datetime.now().strftime("%d/%m/%Y %H:%M"),
-            "deadline": deadline.strftime("%d/%m/%Y"),
-            "deadline_timestamp": deadline.timestamp(),
-            "subtasks": []
-        }
-        
-        self.tasks.append(task)
-        self.save_data()
-        self.refresh_tree()
+        if deadline_passed(deadline, timed):
+            Messagebox.show_warning("A data limite deve ser futura!", "Data Inválida")
+            return
+        
+        task = self.engine.add_task(task_text, deadline,
+                                    recurrence=self.read_recurrence(deadline.timestamp()),
+                                    timed=timed)
         self.task_entry.delete("1.0", tk.END)
         
         # Texto curto para notificação
         short_text = task_text[:50] + "..." if len(task_text) > 50 else task_text
         self.show_notification(
             "✅ Tarefa Adicionada",
-            f"{short_text}\n⏰ Prazo: {deadline.strftime('%d/%m/%Y')}"
+            f"{short_text}\n⏰ Prazo: {deadline_label(task)}"
         )
     
     def add_subtask(self):
@@ -637,6 +904,14 @@ class TaskManagerApp:
         ttk.Label(date_frame, text="/").pack(side=LEFT)
         ttk.Entry(date_frame, textvariable=sub_year, width=6).pack(side=LEFT, padx=2)
         
+        sub_time = tk.StringVar()
+        ttk.Label(date_frame, text="às").pack(side=LEFT, padx=(6, 0))
+        ttk.Entry(date_frame, textvariable=sub_time, width=6).pack(side=LEFT, padx=2)
+        
+        ttk.Label(content, text="Repetir:", font=("Segoe UI", 10, "bold")).pack(anchor=W, pady=(0, 5))
+        recurrence_frame, read_recurrence = self.create_recurrence_input(content)
+        recurrence_frame.pack(anchor=W, pady=(0, 15))
+        
         def save_subtask():
             subtask_content = subtask_text.get("1.0", tk.END).strip()
             if not subtask_content:
@@ -644,41 +919,20 @@ class TaskManagerApp:
                 return
             
             try:
-                day = int(sub_day.get())
-                month = int(sub_month.get())
-                year = int(sub_year.get())
-                deadline = datetime(year, month, day)
-                
-                if deadline < datetime.now():
-                    Messagebox.show_warning("A data limite deve ser futura!", "Data Inválida")
-                    return
+                deadline, timed = read_deadline(sub_day.get(), sub_month.get(),
+                                                sub_year.get(), sub_time.get())
             except ValueError:
                 Messagebox.show_warning("Data inválida!", "Erro")
                 return
             
-            item_id = selected[0]
-            parent_id = self.tree.parent(item_id)
-            
-            subtask = {
-                "id": self.generate_id(),
-                "text": subtask_content,
-                "status": "Pendente",
-                "created": datetime.now().strftime("%d/%m/%Y %H:%M"),
-                "deadline": deadline.strftime("%d/%m/%Y"),
-                "deadline_timestamp": deadline.timestamp(),
-                "subtasks": []
-            }
-            
-            if not parent_id:
-                task_index = int(item_id.split('_')[1])
-                self.tasks[task_index]["subtasks"].append(subtask)
-            else:
-                parent_index = int(parent_id.split('_')[1])
-                current_item_index = int(item_id.split('_')[-1])
-                self.tasks[parent_index]["subtasks"][current_item_index]["subtasks"].append(subtask)
+            if deadline_passed(deadline, timed):
+                Messagebox.show_warning("A data limite deve ser futura!", "Data Inválida")
+                return
             
-            self.save_data()
-            self.refresh_tree()
+            if self.engine.find_task_by_id(selected[0]):
+                self.engine.add_task(subtask_content, deadline, parent_id=selected[0],
+                                     recurrence=read_recurrence(deadline.timestamp()),
+                                     timed=timed)
             dialog.destroy()
         
         btn_frame = ttk.Frame(content)
@@ -691,25 +945,62 @@ class TaskManagerApp:
         
         subtask_text.bind('<Control-Return>', lambda e: save_subtask())
     
+    def selected_task_ids(self):
+        """Ids das tarefas selecionadas na árvore (sem as linhas "…")"""
+        return [item_id for item_id in self.tree.selection() if item_id in self.engine.task_index]
+    
+    def create_recurrence_input(self, parent, rule=None):
+        """Campos "Repetir" (frequência e intervalo). Retorna (frame, função que
+        lê a regra escolhida a partir do prazo em timestamp)"""
+        frame = ttk.Frame(parent)
+        options = {"Não repete": None}
+        options.update({label: freq for freq, label in FREQUENCIES.items()})
+        
+        repeat_var = tk.StringVar(value=FREQUENCIES.get(rule["freq"]) if rule else "Não repete")
+        interval_var = tk.StringVar(value=str(rule.get("interval", 1)) if rule else "1")
+        
+        ttk.Combobox(frame, textvariable=repeat_var, values=list(options),
+                     state="readonly", width=12).pack(side=LEFT)
+        ttk.Label(frame, text="a cada").pack(side=LEFT, padx=(10, 2))
+        ttk.Spinbox(frame, from_=1, to=365, textvariable=interval_var, width=4).pack(side=LEFT)
+        
+        def read_rule(deadline_ts):
+            try:
+                interval = int(interval_var.get())
+            except ValueError:
+                interval = 1
+            return make_rule(options.get(repeat_var.get()), interval, deadline_ts)
+        
+        return frame, read_rule
+    
     def toggle_status(self):
-        selected = self.tree.selection()
+        selected = self.selected_task_ids()
         if not selected:
             Messagebox.show_warning("Selecione uma tarefa!", "Aviso")
             return
         
-        item_id = selected[0]
-        task = self.find_task_by_id(item_id)
+        if len(selected) > 1:
+            # Várias tarefas: concluir todas se alguma estiver pendente, senão reabrir todas
+            tasks = [self.engine.task_index[item_id] for item_id in selected]
+            status = "Concluída" if any(task.status == "Pendente" for task in tasks) else "Pendente"
+            with self.history.group():
+                changed = self.engine.set_status_many(selected, status)
+            self.show_notification(
+                "✅ Status Atualizado",
+                f"{len(changed)} tarefa(s) marcada(s) como {status}"
+            )
+            return
+        
+        # Concluir uma tarefa recorrente também cria a próxima ocorrência
+        with self.history.group():
+            task = self.engine.toggle_status(selected[0])
         
         if task:
-            task["status"] = "Concluída" if task["status"] == "Pendente" else "Pendente"
-            self.save_data()
-            self.refresh_tree()
-            
-            status_emoji = "✅" if task["status"] == "Concluída" else "⏸️"
-            short_text = task['text'][:50] + "..." if len(task['text']) > 50 else task['text']
+            status_emoji = "✅" if task.status == "Concluída" else "⏸️"
+            short_text = task.text[:50] + "..." if len(task.text) > 50 else task.text
             self.show_notification(
                 f"{status_emoji} Status Atualizado",
-                f"{short_text}\nStatus: {task['status']}"
+                f"{short_text}\nStatus: {task.status}"
             )
     
     def edit_task(self):
@@ -719,7 +1010,7 @@ class TaskManagerApp:
             return
         
         item_id = selected[0]
-        task = self.find_task_by_id(item_id)
+        task = self.engine.find_task_by_id(item_id)
         
         if not task:
             return
@@ -744,18 +1035,30 @@ class TaskManagerApp:
         edit_text.pack(side=LEFT, fill=BOTH, expand=YES)
         text_scroll.pack(side=RIGHT, fill=Y)
         
-        edit_text.insert("1.0", task["text"])
+        edit_text.insert("1.0", task.full_text())
         edit_text.focus()
         
+        # A repetição precisa de um prazo
+        read_recurrence = None
+        if task.deadline_ts is not None:
+            recurrence_frame = ttk.Frame(content)
+            recurrence_frame.pack(fill=X, pady=(0, 15))
+            ttk.Label(recurrence_frame, text="Repetir:", font=("Segoe UI", 10, "bold")).pack(side=LEFT)
+            recurrence_input, read_recurrence = self.create_recurrence_input(recurrence_frame, rule_of(task))
+            recurrence_input.pack(side=LEFT, padx=10)
+        
         def save_edit():
             new_text = edit_text.get("1.0", tk.END).strip()
             if not new_text:
                 Messagebox.show_warning("Digite um texto!", "Aviso")
                 return
             
-            task["text"] = new_text
-            self.save_data()
-            self.refresh_tree()
+            with self.history.group():
+                self.engine.edit_text(item_id, new_text)
+                if read_recurrence:
+                    rule = read_recurrence(task.deadline_ts)
+                    if rule != rule_of(task):
+                        self.engine.set_recurrence(item_id, rule)
             dialog.destroy()
         
         btn_frame = ttk.Frame(content)
@@ -769,17 +1072,58 @@ class TaskManagerApp:
         edit_text.bind('<Control-Return>', lambda e: save_edit())
     
     def delete_task(self):
-        selected = self.tree.selection()
+        selected = self.selected_task_ids()
         if not selected:
             Messagebox.show_warning("Selecione uma tarefa!", "Aviso")
             return
         
-        result = Messagebox.yesno("Deseja excluir esta tarefa?", "Confirmar Exclusão")
+        if len(selected) > 1:
+            message = f"Deseja excluir {len(selected)} tarefas?"
+        else:
+            message = "Deseja excluir esta tarefa?"
+        result = Messagebox.yesno(message, "Confirmar Exclusão")
         if result == "Yes":
-            item_id = selected[0]
-            self.remove_task_by_id(item_id)
-            self.save_data()
-            self.refresh_tree()
+            with self.history.group():
+                self.engine.delete_many(selected)
+    
+    def postpone_tasks(self):
+        """Adiar o prazo das tarefas selecionadas em N dias"""
+        selected = self.selected_task_ids()
+        if not selected:
+            Messagebox.show_warning("Selecione uma tarefa!", "Aviso")
+            return
+        
+        days = Querybox.get_integer(
+            f"Adiar o prazo de {len(selected)} tarefa(s) em quantos dias?\n"
+            "(use um número negativo para antecipar)",
+            "Adiar Prazo",
+            initialvalue=1,
+            parent=self.root
+        )
+        if not days:
+            return
+        
+        with self.history.group():
+            shifted = self.engine.shift_deadlines(selected, days)
+        self.show_notification(
+            "📅 Prazo Alterado",
+            f"{len(shifted)} tarefa(s) com prazo alterado em {days} dia(s)"
+        )
+    
+    def undo(self, event=None):
+        """Desfazer a última alteração (fora dos campos de texto, que têm o próprio Ctrl+Z)"""
+        if event is not None and isinstance(event.widget, (tk.Entry, tk.Text)):
+            return
+        if not self.data_loaded or not self.history.undo():
+            self.root.bell()
+        return "break"
+    
+    def redo(self, event=None):
+        if event is not None and isinstance(event.widget, (tk.Entry, tk.Text)):
+            return
+        if not self.data_loaded or not self.history.redo():
+            self.root.bell()
+        return "break"
     
     def send_notification(self):
         selected = self.tree.selection()
@@ -788,218 +1132,590 @@ class TaskManagerApp:
             return
         
         item_id = selected[0]
-        task = self.find_task_by_id(item_id)
+        task = self.engine.find_task_by_id(item_id)
         
         if task:
-            deadline = datetime.fromtimestamp(task.get("deadline_timestamp", time.time()))
-            days_left = (deadline - datetime.now()).days
+            days_left = self.engine.deadlines.days_left(task.id) or 0
             
-            short_text = task['text'][:100] + "..." if len(task['text']) > 100 else task['text']
-            msg = f"📝 {short_text}\n📊 Status: {task['status']}\n⏰ Prazo: {task['deadline']}\n⏳ {days_left} dias restantes"
+            short_text = task.text[:100] + "..." if len(task.text) > 100 else task.text
+            msg = f"📝 {short_text}\n📊 Status: {task.status}\n⏰ Prazo: {deadline_label(task)}\n⏳ {days_left} dias restantes"
             
             self.show_notification("🔔 Lembrete de Tarefa", msg)
     
     def start_notification_service(self):
         """Serviço de notificações automáticas para tarefas pendentes"""
-        def notification_worker():
-            while not self.stop_notifications:
-                try:
-                    current_time = datetime.now()
-                    current_date = current_time.date()
-                    
-                    # Verificar se é um novo dia
-                    if current_date > self.last_check_day:
-                        print(f"Novo dia detectado! Verificando tarefas pendentes...")
-                        self.last_check_day = current_date
-                        
-                        # Notificar sobre todas as tarefas pendentes do dia
-                        for task in self.tasks:
-                            self.check_task_deadline(task, current_time, force_notify=True)
-                    
-                    # Verificação regular (sem forçar notificação)
-                    for task in self.tasks:
-                        self.check_task_deadline(task, current_time, force_notify=False)
-                    
-                    # Verificar a cada 1 hora
-                    time.sleep(3600)
-                    
-                except Exception as e:
-                    print(f"Erro no serviço de notificações: {e}")
-                    time.sleep(300)
-        
-        self.notification_thread = threading.Thread(target=notification_worker, daemon=True)
-        self.notification_thread.start()
-    
-    def check_task_deadline(self, task, current_time, force_notify=False):
-        """Verificar deadline de uma tarefa e suas subtarefas"""
-        if task["status"] == "Pendente" and "deadline_timestamp" in task:
-            deadline = datetime.fromtimestamp(task["deadline_timestamp"])
-            days_left = (deadline - current_time).days
-            
-            # Definir quando notificar
-            should_notify = False
-            
-            if force_notify:
-                # Forçar notificação em novo dia para tarefas próximas ou atrasadas
-                should_notify = days_left <= 7
-            else:
-                # Notificar em momentos específicos
-                should_notify = days_left in [7, 3, 1, 0] or days_left < 0
-            
-            if should_notify:
-                short_text = task['text'][:80] + "..." if len(task['text']) > 80 else task['text']
-                
-                if days_left >= 0:
-                    if days_left == 0:
-                        msg = f"⚠️ {short_text}\n🚨 PRAZO HOJE! Não esqueça!"
-                        title = "🚨 PRAZO HOJE!"
-                    else:
-                        msg = f"⚠️ {short_text}\n⏳ Faltam {days_left} dia(s) para o prazo!"
-                        title = "⏰ Lembrete de Prazo"
-                else:
-                    msg = f"🚨 {short_text}\n❌ Prazo vencido há {abs(days_left)} dia(s)!"
-                    title = "🚨 PRAZO VENCIDO"
-                
-                # Usar thread para não bloquear
-                threading.Thread(
-                    target=lambda: self.show_notification(title, msg, timeout=8),
-                    daemon=True
-                ).start()
-        
-        # Verificar subtarefas recursivamente
-        for subtask in task.get("subtasks", []):
-            self.check_task_deadline(subtask, current_time, force_notify)
-    
-    def find_task_by_id(self, item_id):
-        parts = item_id.split('_')
-        
-        if len(parts) == 2:
-            index = int(parts[1])
-            return self.tasks[index]
+        self.notifier.start()
+        # Ao abrir o programa, lembrar logo as tarefas próximas ou atrasadas
+        for task in self.engine.tasks:
+            self.scheduler.schedule_tree(task, remind_now=True)
+        self.scheduler.start()
+    
+    def schedule_day_rollover(self):
+        """Agendar a atualização das faixas de prazo para a próxima meia-noite"""
+        delay = midnight_of(date.today().toordinal() + 1) - time.time()
+        self.root.after(int(delay * 1000) + 1000, self.on_day_rollover)
+    
+    def on_day_rollover(self):
+        """Virada do dia: avançar as faixas e atualizar as linhas carregadas com prazo"""
+        for task_id in self.engine.rollover():
+            if self.is_loaded(task_id):
+                self.sync_row(self.engine.task_index[task_id],
+                              self.engine.parent_index.get(task_id) or "")
+        
+        if self.due_window is not None:
+            # Tarefas entram e saem das janelas de prazo
+            self.refresh_tree()
+        
+        self.schedule_day_rollover()
+    
+    def schedule_deadline_check(self):
+        """Agendar a verificação dos prazos com hora para o início do próximo minuto"""
+        delay = 60 - time.time() % 60
+        self.root.after(int(delay * 1000) + 50, self.on_deadline_check)
+    
+    def on_deadline_check(self):
+        """Prazos com hora que passaram: as linhas carregadas viram atrasadas já na hora"""
+        for task_id in self.engine.expire_deadlines():
+            if self.is_loaded(task_id):
+                self.sync_row(self.engine.task_index[task_id],
+                              self.engine.parent_index.get(task_id) or "")
+        self.schedule_deadline_check()
+    
+    def schedule_external_check(self):
+        """Verificar de tempos em tempos se outro processo alterou o arquivo de tarefas"""
+        interval = self.config.get("external_check_ms", 2000)
+        if interval:
+            self.root.after(interval, self.check_external_changes)
+    
+    def check_external_changes(self):
+        """Mesclar as alterações de fora; só as linhas das tarefas alteradas são
+        redesenhadas (pelos eventos do engine)"""
+        try:
+            if self.engine.merge_external():
+                self.update_task_count()
+        except Exception as e:
+            print(f"Erro ao mesclar alterações do arquivo de tarefas: {e}")
+        self.schedule_external_check()
+    
+    def notify_deadline(self, task, lead=None):
+        """Notificar o prazo de uma tarefa (chamado pelo agendador)"""
+        reminder = reminder_for(task, lead, self.engine.deadlines)
+        if reminder:
+            title, msg, key, category = reminder
+            self.show_notification(title, msg, timeout=8, key=key, category=category)
+    
+    def on_task_event(self, event, task, parent_id, **details):
+        """Refletir na árvore as alterações feitas no TaskEngine"""
+        if not self.data_loaded:
+            # Arquivamento durante a carga: a árvore ainda não foi desenhada
+            return
+        if event == "added":
+            self.show_new_task(task, details.get("index"))
+        elif event == "updated":
+            self.refresh_task_row(task.id)
+        elif event == "deleted":
+            self.remove_rows(task, parent_id)
+        elif event == "moved":
+            self.move_rows(task, parent_id, details["old_parent_id"], details["index"])
+            self.refresh_ancestors(details["old_parent_id"])
+        
+        # O progresso dos ancestrais mudou junto
+        self.refresh_ancestors(parent_id)
+        
+        if self.is_ordered() and event != "added":
+            # A tarefa e seus ancestrais podem ter mudado de posição ou de filtro
+            self.schedule_sync(parent_id)
+    
+    def reset_view(self):
+        """Limpar o estado de exibição da árvore (linhas carregadas, busca)"""
+        # Cache das linhas já desenhadas. As subtarefas só são inseridas quando
+        # o pai é aberto e as tarefas raiz são carregadas em páginas.
+        self.rendered_rows = {}
+        self.expanded = set()
+        self.placeholders = set()
+        self.loaded_roots = 0
+        self.loading_page = False
+        
+        # Filtro da busca: ids exibidos e ancestrais (abertos) dos resultados
+        self.search_filter = None
+        self.search_ancestors = set()
+        self.search_after_id = None
+        
+        # Ordenação (coluna, decrescente) e filtros de status/prazo
+        self.sort_column = None
+        self.sort_reverse = False
+        self.status_filter = None
+        self.due_window = None
+        # Níveis a reordenar/refiltrar quando a interface ficar ociosa
+        self.pending_sync = set()
+    
+    def is_ordered(self):
+        """Indica se há ordenação ou filtro de status/prazo ativo"""
+        return bool(self.sort_column or self.status_filter) or self.due_window is not None
+    
+    def sort_by(self, column):
+        """Alternar a ordenação pela coluna e reordenar as linhas carregadas"""
+        if self.sort_column != column:
+            self.sort_column, self.sort_reverse = column, False
+        elif not self.sort_reverse:
+            self.sort_reverse = True
         else:
-            task_index = int(parts[1])
-            task = self.tasks[task_index]
-            
-            for i in range(2, len(parts)):
-                subtask_index = int(parts[i])
-                task = task["subtasks"][subtask_index]
-            
-            return task
+            self.sort_column, self.sort_reverse = None, False
+        
+        for name, heading in COLUMN_HEADINGS.items():
+            if name == self.sort_column:
+                heading += " ▼" if self.sort_reverse else " ▲"
+            self.tree.heading(name, text=heading)
+        
+        self.refresh_tree()
+    
+    def apply_filters(self):
+        """Aplicar os filtros de status e de prazo escolhidos"""
+        self.status_filter = self.status_filter_var.get() or None
+        due = self.due_filter_var.get()
+        self.due_window = int(due) if due else None
+        self.refresh_tree()
+    
+    def matches_filters(self, task):
+        """A tarefa aparece se ela ou alguma subtarefa passa nos filtros
+        (usa os totais em cache da subárvore)"""
+        totals = self.engine.aggregates.get(task)
+        if self.status_filter == "Pendente" and not totals.pending:
+            return False
+        if self.status_filter == "Concluída" and not totals.completed:
+            return False
+        if self.due_window is not None:
+            if totals.earliest is None:
+                return False
+            if totals.earliest - self.engine.deadlines.today > self.due_window:
+                return False
+        return True
+    
+    def refresh_tree(self):
+        """Sincronizar as linhas já carregadas, alterando apenas as modificadas"""
+        seen = set()
+        
+        # Primeira página de tarefas raiz; as demais entram ao rolar a árvore
+        roots = self.visible_children(None)
+        self.loaded_roots = min(len(roots), max(self.loaded_roots, TREE_PAGE_SIZE))
+        for i, task in enumerate(roots[:self.loaded_roots]):
+            self.sync_task(task, "", i, seen)
+        
+        # Remover linhas que não existem mais (filhos antes de pais não importa:
+        # excluir um pai no Treeview já remove seus filhos)
+        stale = [item_id for item_id in self.rendered_rows if item_id not in seen]
+        for item_id in stale:
+            self.forget_row(item_id)
+            self.expanded.discard(item_id)
+            self.placeholders.discard(f"{item_id}_placeholder")
+            if self.tree.exists(item_id):
+                self.tree.delete(item_id)
+        
+        self.update_task_count()
+    
+    def sync_task(self, task, parent, index, seen=None):
+        """Sincronizar uma tarefa e, se ela já foi expandida, suas subtarefas"""
+        self.sync_row(task, parent, index)
+        if seen is not None:
+            seen.add(task.id)
+        
+        if task.id in self.expanded:
+            for j, subtask in enumerate(self.visible_children(task)):
+                self.sync_task(subtask, task.id, j, seen)
+        else:
+            self.sync_placeholder(task)
+    
+    def visible_children(self, task):
+        """Subtarefas exibidas (ou tarefas raiz, se task for None), respeitando a busca"""
+        children = self.engine.tasks if task is None else task.subtasks
+        # Abaixo de um resultado da busca tudo é exibido
+        if self.search_filter is not None and (task is None or task.id in self.search_ancestors):
+            children = [child for child in children if child.id in self.search_filter]
+        if self.status_filter or self.due_window is not None:
+            children = [child for child in children if self.matches_filters(child)]
+        if self.sort_column:
+            # Ordenação estável: empates mantêm a ordem original
+            children = sorted(children, key=SORT_KEYS[self.sort_column], reverse=self.sort_reverse)
+        return children
+    
+    def sync_row(self, task, parent, index=tk.END):
+        """Inserir ou atualizar uma única linha, somente se ela mudou"""
+        item_id = task.id
+        row = self.task_row(task)
+        old_row = self.rendered_rows.get(item_id)
+        
+        # Linha já existente fora da posição pedida (ordenação mudou): só movê-la
+        if old_row is not None and index != tk.END and self.tree.index(item_id) != index:
+            self.tree.move(item_id, parent, index)
+        
+        if old_row == row:
+            return
+        
+        text, values, tags = row
+        
+        if old_row is None:
+            self.tree.insert(parent, index, item_id, text=text, values=values, tags=tags,
+                             open=item_id in self.search_ancestors)
+        else:
+            self.tree.item(item_id, text=text, values=values, tags=tags)
+        
+        self.rendered_rows[item_id] = row
+    
+    def sync_placeholder(self, task):
+        """Manter uma linha vazia sob tarefas não expandidas que têm subtarefas,
+        para que o Treeview mostre o indicador de expandir"""
+        placeholder = f"{task.id}_placeholder"
+        has_placeholder = placeholder in self.placeholders
+        
+        if task.subtasks and not has_placeholder:
+            self.tree.insert(task.id, tk.END, placeholder, text="…")
+            self.placeholders.add(placeholder)
+        elif not task.subtasks and has_placeholder:
+            self.tree.delete(placeholder)
+            self.placeholders.discard(placeholder)
+    
+    def is_loaded(self, task_id):
+        """Indica se a linha da tarefa já existe na árvore"""
+        return task_id in self.rendered_rows
     
-    def remove_task_by_id(self, item_id):
-        parts = item_id.split('_')
+    def show_new_task(self, task, index=None):
+        """Exibir uma tarefa recém-criada (ou reinserida na posição `index`),
+        se o lugar dela já foi carregado na árvore"""
+        parent_id = self.engine.parent_index.get(task.id)
+        if index is None:
+            index = len(self.engine.get_siblings(task.id)) - 1
+        
+        if self.search_filter is not None:
+            # Refazer a busca para decidir se a nova tarefa aparece
+            self.apply_search()
+        elif self.is_ordered():
+            # Posição (e visibilidade) dependem da ordenação e dos filtros
+            self.schedule_sync(parent_id)
+        elif parent_id is None:
+            # Dentro da parte já carregada, ou logo após ela se tudo estava carregado
+            if index < self.loaded_roots or self.loaded_roots == len(self.engine.tasks) - 1:
+                self.sync_task(task, "", index)
+                self.loaded_roots += 1
+        elif parent_id in self.expanded:
+            self.sync_task(task, parent_id, index)
+        elif self.is_loaded(parent_id):
+            self.sync_placeholder(self.engine.task_index[parent_id])
+        
+        self.update_task_count()
+    
+    def move_rows(self, task, parent_id, old_parent_id, index):
+        """Levar a linha de uma tarefa movida para o novo lugar na árvore"""
+        if self.search_filter is not None:
+            self.apply_search()
+            return
+        if self.is_ordered():
+            self.schedule_sync(old_parent_id)
+            self.schedule_sync(parent_id)
+            return
+        
+        if old_parent_id is None and self.is_loaded(task.id):
+            self.loaded_roots -= 1
+        
+        # O novo lugar está carregado: mover a linha (ou inseri-la, se ainda não existia)
+        if parent_id is None:
+            visible = index < self.loaded_roots or self.loaded_roots == len(self.engine.tasks) - 1
+        else:
+            visible = parent_id in self.expanded
+        
+        if not visible:
+            if self.is_loaded(task.id):
+                self.hide_rows(task, task.id)
+        elif self.is_loaded(task.id):
+            self.tree.move(task.id, parent_id or "", index)
+        else:
+            self.sync_task(task, parent_id or "", index)
+        
+        if parent_id is None and visible:
+            self.loaded_roots += 1
+        
+        for placeholder_parent in (old_parent_id, parent_id):
+            if (placeholder_parent is not None and self.is_loaded(placeholder_parent)
+                    and placeholder_parent not in self.expanded):
+                self.sync_placeholder(self.engine.task_index[placeholder_parent])
+    
+    def on_drag_start(self, event):
+        item_id = self.tree.identify_row(event.y)
+        self.drag_item = item_id if self.data_loaded and item_id in self.engine.task_index else None
+        self.drag_start_y = event.y
+        self.dragging = False
+    
+    def on_drag_motion(self, event):
+        if self.drag_item and not self.dragging and abs(event.y - self.drag_start_y) > DRAG_THRESHOLD:
+            self.dragging = True
+            self.tree.config(cursor="fleur")
+    
+    def on_drop(self, event):
+        """Soltar a tarefa arrastada: no quarto de cima/de baixo da linha de
+        destino ela entra antes/depois dela; no meio, vira sua última subtarefa"""
+        item_id, dragging = self.drag_item, self.dragging
+        self.drag_item = None
+        self.dragging = False
+        if not dragging:
+            return
+        self.tree.config(cursor="")
+        
+        target = self.tree.identify_row(event.y)
+        if target.endswith("_placeholder"):
+            target = target[:-len("_placeholder")]
+        if target == item_id or target not in self.engine.task_index:
+            return
         
-        if len(parts) == 2:
-            index = int(parts[1])
-            del self.tasks[index]
+        _, y, _, height = self.tree.bbox(target)
+        offset = (event.y - y) / max(height, 1)
+        if 0.25 <= offset <= 0.75:
+            new_parent_id, position = target, None
         else:
-            task_index = int(parts[1])
-            task = self.tasks[task_index]
+            new_parent_id = self.engine.parent_index.get(target)
+            position = self.engine.index_of(target) + (1 if offset > 0.75 else 0)
+            if (self.engine.parent_index.get(item_id) == new_parent_id
+                    and self.engine.index_of(item_id) < position):
+                # A tarefa sai da mesma lista antes de ser inserida
+                position -= 1
+        
+        # Só a linha (e o nó no backend) mudam de lugar; mover para dentro
+        # da própria subárvore é recusado pelo engine
+        self.engine.move_task(item_id, new_parent_id, position)
+    
+    def schedule_sync(self, parent_id):
+        """Reposicionar o nível de parent_id (e os de cima) uma vez só, depois de
+        todos os eventos em andamento: uma ação em lote com k tarefas faz uma
+        única ordenação por nível, e não k"""
+        first = not self.pending_sync
+        self.pending_sync.add(parent_id)
+        if first:
+            self.root.after_idle(self.flush_sync)
+    
+    def flush_sync(self):
+        levels = set()
+        for parent_id in self.pending_sync:
+            while parent_id is not None and parent_id not in levels:
+                levels.add(parent_id)
+                parent_id = self.engine.parent_index.get(parent_id)
+        self.pending_sync = set()
+        
+        def depth(task_id):
+            count = 0
+            while task_id is not None:
+                task_id = self.engine.parent_index.get(task_id)
+                count += 1
+            return count
+        
+        # Os níveis de baixo antes dos de cima
+        for parent_id in sorted(levels, key=depth, reverse=True):
+            if parent_id in self.engine.task_index:
+                self.sync_level(parent_id)
+        self.sync_level(None)
+    
+    def sync_level(self, parent_id):
+        """Deixar as linhas de um nível (filhos de parent_id, ou as tarefas raiz)
+        na ordem e com os filtros atuais, movendo as existentes com tree.move"""
+        if parent_id is None:
+            children = self.visible_children(None)
+            self.loaded_roots = min(len(children), max(self.loaded_roots, TREE_PAGE_SIZE))
+            children = children[:self.loaded_roots]
+        elif parent_id in self.expanded and self.is_loaded(parent_id):
+            children = self.visible_children(self.engine.task_index[parent_id])
+        else:
+            return
+        
+        parent = parent_id or ""
+        shown = {child.id for child in children}
+        for item_id in self.tree.get_children(parent):
+            if item_id in self.rendered_rows and item_id not in shown:
+                self.hide_rows(self.engine.task_index.get(item_id), item_id)
+        
+        for i, child in enumerate(children):
+            if self.is_loaded(child.id):
+                self.sync_row(child, parent, i)
+            else:
+                self.sync_task(child, parent, i)
+        
+        self.update_task_count()
+    
+    def hide_rows(self, task, item_id):
+        """Tirar da árvore a linha de uma tarefa (e de suas subtarefas carregadas)"""
+        stack = [task] if task else []
+        while stack:
+            node = stack.pop()
+            self.forget_row(node.id)
+            self.expanded.discard(node.id)
+            self.placeholders.discard(f"{node.id}_placeholder")
+            stack.extend(node.subtasks)
+        self.forget_row(item_id)
+        if self.tree.exists(item_id):
+            self.tree.delete(item_id)
+    
+    def on_tree_open(self, event=None):
+        """Inserir as subtarefas somente quando a tarefa é aberta"""
+        self.expand_row(self.tree.focus())
+    
+    def expand_row(self, task_id):
+        task = self.engine.find_task_by_id(task_id)
+        if not task or task_id in self.expanded:
+            return
+        
+        self.expanded.add(task_id)
+        placeholder = f"{task_id}_placeholder"
+        if placeholder in self.placeholders:
+            self.tree.delete(placeholder)
+            self.placeholders.discard(placeholder)
+        
+        for j, subtask in enumerate(self.visible_children(task)):
+            self.sync_task(subtask, task_id, j)
+    
+    def on_tree_scroll(self, first, last):
+        """Carregar a próxima página de tarefas raiz ao chegar perto do fim"""
+        self.tree_vsb.set(first, last)
+        if float(last) > 0.9 and not self.loading_page:
+            self.loading_page = True
+            self.root.after_idle(self.load_next_page)
+    
+    def load_next_page(self):
+        roots = self.visible_children(None)
+        end = min(len(roots), self.loaded_roots + TREE_PAGE_SIZE)
+        for i in range(self.loaded_roots, end):
+            self.sync_task(roots[i], "", i)
+        self.loaded_roots = end
+        self.loading_page = False
+    
+    def schedule_search(self):
+        """Esperar o usuário parar de digitar antes de filtrar a árvore"""
+        if self.search_after_id:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(250, self.apply_search)
+    
+    def apply_search(self):
+        """Filtrar a árvore pelos resultados do índice de busca"""
+        self.search_after_id = None
+        if not self.data_loaded:
+            return
+        query = self.search_var.get().strip()
+        
+        if query:
+            matches = self.engine.search_index.search(query)
+            shown = list(matches)[:MAX_SEARCH_RESULTS]
             
-            for i in range(2, len(parts) - 1):
-                subtask_index = int(parts[i])
-                task = task["subtasks"][subtask_index]
+            # Exibir também o caminho até cada resultado
+            ancestors = set()
+            for task_id in shown:
+                parent_id = self.engine.parent_index.get(task_id)
+                while parent_id is not None and parent_id not in ancestors:
+                    ancestors.add(parent_id)
+                    parent_id = self.engine.parent_index.get(parent_id)
             
-            del task["subtasks"][int(parts[-1])]
+            self.search_filter = set(shown) | ancestors
+            self.search_ancestors = ancestors
+            self.search_result_label.config(text=f"{len(matches)} resultado(s)")
+        else:
+            self.search_filter = None
+            self.search_ancestors = set()
+            self.search_result_label.config(text="")
+        
+        # Recomeçar a árvore apenas com as linhas filtradas
+        self.tree.delete(*self.tree.get_children())
+        self.rendered_rows.clear()
+        self.placeholders.clear()
+        self.expanded = set(self.search_ancestors)
+        self.loaded_roots = 0
+        self.refresh_tree()
     
-    def refresh_tree(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+    def refresh_task_row(self, task_id):
+        """Atualizar apenas a linha da tarefa informada (sem tocar nas subtarefas)"""
+        task = self.engine.find_task_by_id(task_id)
+        if task and self.is_loaded(task_id):
+            self.sync_row(task, self.engine.parent_index.get(task_id) or "")
+        self.update_task_count()
+    
+    def refresh_ancestors(self, task_id):
+        """Atualizar as linhas carregadas da tarefa e de seus ancestrais"""
+        while task_id is not None:
+            if self.is_loaded(task_id):
+                self.sync_row(self.engine.task_index[task_id],
+                              self.engine.parent_index.get(task_id) or "")
+            task_id = self.engine.parent_index.get(task_id)
+    
+    def remove_rows(self, task, parent_id):
+        """Remover da árvore a linha de uma tarefa já excluída e de suas subtarefas"""
+        if parent_id is None and self.is_loaded(task.id):
+            self.loaded_roots -= 1
         
-        pending_count = 0
-        completed_count = 0
+        self.hide_rows(task, task.id)
         
-        for i, task in enumerate(self.tasks):
-            counts = self.insert_task(task, "", f"task_{i}")
-            pending_count += counts[0]
-            completed_count += counts[1]
+        # O pai pode ter ficado sem subtarefas
+        if parent_id is not None and self.is_loaded(parent_id) and parent_id not in self.expanded:
+            self.sync_placeholder(self.engine.task_index[parent_id])
         
+        self.update_task_count()
+    
+    def forget_row(self, item_id):
+        """Remover uma linha do cache de renderização"""
+        self.rendered_rows.pop(item_id, None)
+    
+    def update_task_count(self):
+        # Inclui as tarefas arquivadas (totais do resumo do arquivo)
+        archived = self.engine.archived_counts()
+        pending_count = self.engine.task_counts["Pendente"] + archived["Pendente"]
+        completed_count = self.engine.task_counts["Concluída"] + archived["Concluída"]
         total = pending_count + completed_count
-        self.task_count_label.config(
-            text=f"📊 Total: {total} | ⏳ Pendentes: {pending_count} | ✅ Concluídas: {completed_count}"
-        )
+        text = f"📊 Total: {total} | ⏳ Pendentes: {pending_count} | ✅ Concluídas: {completed_count}"
+        archived_total = sum(archived.values())
+        if archived_total:
+            text += f" (📦 {archived_total} arquivada(s))"
+        self.task_count_label.config(text=text)
     
-    def insert_task(self, task, parent, item_id):
-        """Inserir tarefa e retornar (pendentes, concluídas)"""
-        # Calcular dias restantes
-        if "deadline_timestamp" in task:
-            deadline = datetime.fromtimestamp(task["deadline_timestamp"])
-            days_left = (deadline - datetime.now()).days
-            
-            if days_left < 0:
-                days_text = f"❌ Atrasado ({abs(days_left)}d)"
-                tag = "overdue"
-            elif days_left == 0:
-                days_text = "⚠️ Hoje!"
-                tag = "urgent"
-            elif days_left <= 3:
-                days_text = f"⚠️ {days_left} dias"
-                tag = "urgent"
-            else:
-                days_text = f"✓ {days_left} dias"
-                tag = "normal"
-        else:
-            days_text = "—"
-            tag = "normal"
+    def task_row(self, task):
+        """Calcular (texto, valores, tags, status) da linha de uma tarefa"""
+        # Dias restantes vêm das faixas pré-calculadas (texto em cache por valor)
+        days_text, tag = row_label(self.engine.deadlines.days_left(task.id),
+                                   self.engine.deadlines.is_expired(task.id))
         
-        status_symbol = "✅" if task["status"] == "Concluída" else "⏳"
+        status_symbol = "✅" if task.status == "Concluída" else "⏳"
+        status_text = f"{status_symbol} {task.status}"
         
-        # Truncar texto para exibição na árvore
-        display_text = task["text"][:150] + "..." if len(task["text"]) > 150 else task["text"]
-        
-        self.tree.insert(
-            parent, tk.END, item_id,
-            text=display_text,
-            values=(f"{status_symbol} {task['status']}", task.get("deadline", "—"), 
-                   task["created"], days_text),
-            tags=(task["status"].lower(), tag)
-        )
+        # Progresso das subtarefas, dos totais em cache da subárvore
+        progress = self.engine.aggregates.progress(task)
+        if progress:
+            status_text += f" · {progress[0]}/{progress[1]} ✓"
         
-        pending = 1 if task["status"] == "Pendente" else 0
-        completed = 1 if task["status"] == "Concluída" else 0
+        # Truncar texto para exibição na árvore
+        display_text = task.text[:150] + "..." if len(task.text) > 150 else task.text
         
-        for j, subtask in enumerate(task.get("subtasks", [])):
-            counts = self.insert_task(subtask, item_id, f"{item_id}_{j}")
-            pending += counts[0]
-            completed += counts[1]
+        deadline_text = deadline_label(task)
+        if task.extra and "recurrence" in task.extra:
+            deadline_text += " 🔁"
         
-        # Configurar tags
-        self.tree.tag_configure("concluída", foreground="#66bb6a")
-        self.tree.tag_configure("pendente", foreground="#ffa726")
-        self.tree.tag_configure("overdue", background="#3d1f1f")
-        self.tree.tag_configure("urgent", background="#3d2a1f")
+        values = (status_text, deadline_text, task.created, days_text)
         
-        return (pending, completed)
-    
-    def generate_id(self):
-        return str(datetime.now().timestamp())
+        return (display_text, values, (task.status.lower(), tag))
     
     def change_theme(self, theme_name):
+        """Trocar o tema sem recriar os widgets: só os estilos e as cores das
+        tags mudam, então árvore, seleção, rolagem e linhas abertas continuam"""
         self.current_theme = theme_name
         self.config["theme"] = theme_name
         self.save_config()
         
-        # Recriar a interface com novo tema
-        for widget in self.root.winfo_children():
-            widget.destroy()
-        
-        self.style = ttk.Style(theme=theme_name)
-        self.create_menu()
-        self.create_widgets()
+        self.style.theme_use(theme_name)
         self.apply_custom_styles()
-        self.refresh_tree()
+        self.apply_tag_colors()
         
-        Messagebox.show_info(f"Tema '{theme_name}' aplicado com sucesso!", "Tema Alterado")
+        if theme_name == "purple-dark":
+            Messagebox.show_info("Tema Roxo Escuro aplicado com sucesso!", "Tema Aplicado")
+        else:
+            Messagebox.show_info(f"Tema '{theme_name}' aplicado com sucesso!", "Tema Alterado")
     
     def on_closing(self):
-        self.stop_notifications = True
-        self.save_data()
+        self.scheduler.stop()
+        self.notifier.stop()
+        # Gravar alterações pendentes antes de sair
+        self.engine.close()
         self.save_config()
         
-        if self.notification_thread and self.notification_thread.is_alive():
-            # Dar tempo para a thread encerrar
-            time.sleep(0.5)
-        
         self.root.destroy()
 
 if __name__ == "__main__":
@@ -0,0 +1,464 @@
+"""
+Agendamento e envio das notificações de prazo
+
+Em vez de varrer todas as tarefas a cada hora, cada tarefa pendente tem um
+único próximo instante de notificação guardado em uma fila de prioridade.
+A thread de notificações dorme exatamente até o próximo evento.
+
+Além do lembrete diário, tarefas com hora no prazo são lembradas N minutos
+antes dela (antecedências configuráveis, ex.: 60 e 15 minutos).
+
+O envio passa por um único despachante com fila limitada, que descarta
+lembretes repetidos no mesmo dia, agrupa rajadas em uma notificação de
+resumo e respeita um limite de notificações por minuto.
+"""
+
+import heapq
+import itertools
+import queue
+import threading
+import time
+from datetime import date, datetime
+
+from recurrence import describe, occurrences_until, rule_of
+
+# Janela (em dias) em que a tarefa é lembrada a cada virada de dia
+DAILY_REMINDER_DAYS = 7
+
+# Próximas ocorrências de uma tarefa recorrente citadas no lembrete
+MAX_LISTED_OCCURRENCES = 3
+
+
+def midnight_of(day):
+    """Timestamp da meia-noite local do dia (ordinal)"""
+    return datetime.combine(date.fromordinal(day), datetime.min.time()).timestamp()
+
+
+def next_notification_time(deadline_day, now, remind_now=False, hour=0):
+    """Próximo instante (timestamp) em que a tarefa deve ser notificada.
+
+    Os dias restantes só mudam na virada do dia, então a tarefa é lembrada
+    uma vez por dia, na hora `hour`, a partir de DAILY_REMINDER_DAYS dias
+    antes do prazo (inclusive depois de vencida). Com `remind_now`, uma
+    tarefa que já está nessa janela é lembrada imediatamente.
+    """
+    today = datetime.fromtimestamp(now).date().toordinal()
+    if remind_now and deadline_day - today <= DAILY_REMINDER_DAYS:
+        return now
+    instant = midnight_of(max(today, deadline_day - DAILY_REMINDER_DAYS)) + hour * 3600
+    if instant <= now:
+        instant = midnight_of(max(today + 1, deadline_day - DAILY_REMINDER_DAYS)) + hour * 3600
+    return instant
+
+
+class DeadlineScheduler:
+    """Fila de prioridade com o próximo lembrete de cada tarefa pendente.
+
+    Os dias de prazo vêm do DeadlineClassifier compartilhado com a árvore.
+    `notify(tarefa, antecedência)` é chamado na thread do agendador; a
+    antecedência (minutos antes da hora do prazo) é None no lembrete diário.
+    """
+
+    def __init__(self, notify, deadlines, lead_minutes=(), daily_hour=0):
+        self.notify = notify
+        self.deadlines = deadlines
+        # Antecedências dos lembretes de prazos com hora, da maior para a menor
+        self.lead_minutes = sorted(set(lead_minutes), reverse=True)
+        # Hora do dia do lembrete diário
+        self.daily_hour = daily_hour
+        self.heap = []
+        # id da tarefa -> (instante, tarefa, antecedência) da entrada válida no heap
+        self.entries = {}
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.thread = None
+
+    def next_reminder(self, task, now, remind_now=False):
+        """(instante, antecedência) do próximo lembrete da tarefa, ou None"""
+        deadline_day = self.deadlines.deadline_day(task.id)
+        if task.status != "Pendente" or deadline_day is None:
+            return None
+
+        reminder = (next_notification_time(deadline_day, now, remind_now, self.daily_hour), None)
+        if task.deadline_time:
+            for lead in self.lead_minutes:
+                instant = task.deadline_ts - lead * 60
+                # No empate com o lembrete diário vale o da hora do prazo
+                if now < instant <= reminder[0]:
+                    reminder = (instant, lead)
+        return reminder
+
+    def schedule(self, task, now=None, remind_now=False):
+        """(Re)agendar uma tarefa; acorda a thread se o evento for o mais próximo"""
+        reminder = self.next_reminder(task, now or time.time(), remind_now)
+
+        with self.condition:
+            if reminder is None:
+                self.entries.pop(task.id, None)
+                return
+            instant, lead = reminder
+            self.entries[task.id] = (instant, task, lead)
+            heapq.heappush(self.heap, (instant, next(self.counter), task.id))
+            if self.heap[0][2] == task.id:
+                self.condition.notify()
+
+    def schedule_tree(self, task, now=None, remind_now=False):
+        """Agendar uma tarefa e todas as suas subtarefas"""
+        now = now or time.time()
+        stack = [task]
+        while stack:
+            node = stack.pop()
+            self.schedule(node, now, remind_now)
+            stack.extend(node.subtasks)
+
+    def unschedule(self, task_id):
+        # A entrada antiga fica no heap e é descartada quando chegar ao topo
+        with self.condition:
+            self.entries.pop(task_id, None)
+
+    def unschedule_tree(self, task):
+        stack = [task]
+        while stack:
+            node = stack.pop()
+            self.unschedule(node.id)
+            stack.extend(node.subtasks)
+
+    def clear(self):
+        with self.condition:
+            self.entries.clear()
+            self.heap = []
+
+    def on_task_event(self, event, task, parent_id, **details):
+        """Manter a fila em dia com as alterações do TaskEngine"""
+        if event == "deleted":
+            self.unschedule_tree(task)
+        elif event == "added":
+            self.schedule_tree(task)
+        elif event == "updated":
+            self.schedule(task)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                entry = self.wait_next()
+                if entry is None:
+                    return
+
+            _, task, lead = entry
+            try:
+                self.notify(task, lead)
+            except Exception as e:
+                print(f"Erro no serviço de notificações: {e}")
+
+            self.schedule(task)
+
+    def wait_next(self):
+        """Esperar (com o lock adquirido) até o próximo lembrete vencer e retornar
+        sua entrada (instante, tarefa, antecedência); None ao parar"""
+        while not self.stopped:
+            if not self.heap:
+                self.condition.wait()
+                continue
+
+            instant, _, task_id = self.heap[0]
+            entry = self.entries.get(task_id)
+            if entry is None or entry[0] != instant:
+                heapq.heappop(self.heap)
+                continue
+
+            delay = instant - time.time()
+            if delay > 0:
+                self.condition.wait(delay)
+                continue
+
+            heapq.heappop(self.heap)
+            del self.entries[task_id]
+            return entry
+        return None
+
+
+# Textos do resumo por categoria de lembrete de prazo
+SUMMARY_LABELS = {
+    "overdue": "🚨 {} tarefa(s) atrasada(s)",
+    "today": "⚠️ {} tarefa(s) com prazo hoje",
+    "upcoming": "⏰ {} tarefa(s) com prazo próximo",
+}
+
+
+class NotificationDispatcher:
+    """Fila única de notificações com deduplicação, agrupamento e limite de taxa.
+
+    `show(title, message, timeout)` é chamado somente pela thread do despachante.
+    """
+
+    def __init__(self, show, rate_per_minute=6, max_queue=200,
+                 burst_window=1.0, summary_threshold=3):
+        self.show = show
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.rate_per_minute = max(1, rate_per_minute)
+        self.burst_window = burst_window
+        self.summary_threshold = summary_threshold
+
+        # Chaves já enviadas hoje (tarefa, limiar)
+        self.sent_keys = set()
+        self.sent_day = date.today()
+        self.lock = threading.Lock()
+
+        # Balde de fichas para o limite de taxa
+        self.tokens = float(self.rate_per_minute)
+        self.last_refill = time.monotonic()
+
+        self.stopped = False
+        self.thread = None
+
+    def submit(self, title, message, timeout=10, key=None, category=None):
+        """Enfileirar uma notificação. Retorna False se foi descartada.
+
+        `key` identifica o lembrete para deduplicação diária e `category`
+        ("overdue", "today" ou "upcoming") permite agrupá-lo em um resumo.
+        """
+        if key is not None:
+            with self.lock:
+                today = date.today()
+                if today != self.sent_day:
+                    self.sent_keys.clear()
+                    self.sent_day = today
+                if key in self.sent_keys:
+                    return False
+                self.sent_keys.add(key)
+
+        try:
+            self.queue.put_nowait((title, message, timeout, category))
+        except queue.Full:
+            print(f"Fila de notificações cheia, descartando: {title}")
+            return False
+        return True
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped = True
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def run(self):
+        while not self.stopped:
+            batch = self.collect_batch()
+            for title, message, timeout in self.coalesce(batch):
+                self.wait_for_token()
+                if self.stopped:
+                    return
+                try:
+                    self.show(title, message, timeout)
+                except Exception as e:
+                    print(f"Erro ao exibir notificação: {e}")
+
+    def collect_batch(self):
+        """Esperar a primeira notificação e juntar as que chegarem logo em seguida"""
+        item = self.queue.get()
+        if item is None:
+            return []
+
+        batch = [item]
+        end = time.monotonic() + self.burst_window
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                break
+            batch.append(item)
+        return batch
+
+    def coalesce(self, batch):
+        """Transformar uma rajada de lembretes de prazo em uma única notificação"""
+        reminders = [item for item in batch if item[3] in SUMMARY_LABELS]
+        others = [item[:3] for item in batch if item[3] not in SUMMARY_LABELS]
+
+        if len(reminders) < self.summary_threshold:
+            return [item[:3] for item in reminders] + others
+
+        counts = {category: 0 for category in SUMMARY_LABELS}
+        for item in reminders:
+            counts[item[3]] += 1
+
+        lines = [SUMMARY_LABELS[category].format(count)
+                 for category, count in counts.items() if count]
+        summary = ("🔔 Resumo de Prazos", "\n".join(lines), 10)
+        return [summary] + others
+
+    def wait_for_token(self):
+        """Bloquear até haver uma ficha disponível no balde"""
+        while not self.stopped:
+            now = time.monotonic()
+            self.tokens = min(
+                self.rate_per_minute,
+                self.tokens + (now - self.last_refill) * self.rate_per_minute / 60
+            )
+            self.last_refill = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            time.sleep((1 - self.tokens) * 60 / self.rate_per_minute)
+
+
+def deadline_message(task, days_left):
+    """(título, mensagem, categoria) do lembrete de prazo de uma tarefa"""
+    short_text = task.text[:80] + "..." if len(task.text) > 80 else task.text
+
+    if days_left >= 0:
+        if days_left == 0:
+            msg = f"⚠️ {short_text}\n🚨 PRAZO HOJE! Não esqueça!"
+            title, category = "🚨 PRAZO HOJE!", "today"
+        else:
+            msg = f"⚠️ {short_text}\n⏳ Faltam {days_left} dia(s) para o prazo!"
+            title, category = "⏰ Lembrete de Prazo", "upcoming"
+    else:
+        msg = f"🚨 {short_text}\n❌ Prazo vencido há {abs(days_left)} dia(s)!"
+        title, category = "🚨 PRAZO VENCIDO", "overdue"
+
+    return title, msg + recurrence_note(task), category
+
+
+def lead_message(task, lead):
+    """(título, mensagem, categoria) do lembrete `lead` minutos antes da hora do prazo"""
+    short_text = task.text[:80] + "..." if len(task.text) > 80 else task.text
+    if lead == 0:
+        return "🚨 PRAZO AGORA!", f"⚠️ {short_text}\n⏰ Prazo: {task.deadline_time}", "today"
+    wait = f"{lead // 60} h" if lead % 60 == 0 else f"{lead} min"
+    msg = f"⚠️ {short_text}\n⏰ Prazo às {task.deadline_time} (em {wait})"
+    return f"⏰ Prazo em {wait}", msg, "today"
+
+
+def reminder_for(task, lead, deadlines):
+    """(título, mensagem, chave, categoria) do lembrete de uma tarefa, ou None.
+
+    A chave evita repetir o mesmo lembrete no mesmo dia (ver NotificationDispatcher).
+    """
+    if lead is not None:
+        title, msg, category = lead_message(task, lead)
+        return title, msg, (task.id, f"lead-{lead}"), category
+
+    # Dia atual do relógio: a virada do dia na interface pode ainda não ter rodado
+    days_left = deadlines.days_left(task.id, date.today())
+    if days_left is None:
+        return None
+    title, msg, category = deadline_message(task, days_left)
+    # Um lembrete por tarefa e limiar a cada dia
+    threshold = days_left if days_left >= 0 else "overdue"
+    return title, msg, (task.id, threshold), category
+
+
+def recurrence_note(task, now=None):
+    """Linha com a regra e as próximas ocorrências dentro da janela de lembretes
+    (calculadas na hora; as ocorrências futuras não existem como tarefas)"""
+    rule = rule_of(task)
+    if not rule or task.deadline_ts is None:
+        return ""
+
+    until = (now or time.time()) + DAILY_REMINDER_DAYS * 86400
+    upcoming = itertools.islice(occurrences_until(rule, task.deadline_ts, until), MAX_LISTED_OCCURRENCES)
+    dates = ", ".join(datetime.fromtimestamp(ts).strftime("%d/%m") for ts in upcoming)
+    note = f"\n🔁 {describe(rule)}"
+    return note + f" (próximas: {dates})" if dates else note
+
+
+def run_standalone(config_file="app_config.json", data_file="tasks_data.json", poll_interval=60):
+    """Rodar só o serviço de notificações, sem abrir a janela.
+
+    As tarefas são relidas (somente leitura, ver ReadOnlyStorage) quando os
+    arquivos de dados mudam.
+    """
+    import json
+    import os
+
+    from plyer import notification
+    from storage import ReadOnlyStorage
+    from task_engine import TaskEngine
+
+    config = {}
+    if os.path.exists(config_file):
+        with open(config_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+    def display(title, message, timeout):
+        notification.notify(
+            title=title,
+            message=message,
+            app_name="Gerenciador de Tarefas Pro",
+            timeout=timeout
+        )
+
+    engine = TaskEngine(ReadOnlyStorage(config.get("storage", "json"), data_file))
+    dispatcher = NotificationDispatcher(
+        display, rate_per_minute=config.get("notifications_per_minute", 6)
+    )
+
+    def notify(task, lead=None):
+        reminder = reminder_for(task, lead, engine.deadlines)
+        if reminder:
+            title, msg, key, category = reminder
+            dispatcher.submit(title, msg, timeout=8, key=key, category=category)
+
+    scheduler = DeadlineScheduler(
+        notify,
+        engine.deadlines,
+        lead_minutes=config.get("reminder_lead_minutes", [60, 15]),
+        daily_hour=config.get("daily_reminder_hour", 9)
+    )
+
+    base = os.path.splitext(data_file)[0]
+    watched = [data_file, data_file + ".log", base + ".db", base + ".db-wal"]
+
+    def files_state():
+        return [os.stat(path).st_mtime_ns if os.path.exists(path) else None for path in watched]
+
+    dispatcher.start()
+    scheduler.start()
+    state = None
+    try:
+        while True:
+            new_state = files_state()
+            if new_state != state:
+                try:
+                    engine.load()
+                except Exception as e:
+                    # Ex.: arquivo no meio de uma gravação; tentar de novo na próxima volta
+                    print(f"Erro ao ler as tarefas: {e}")
+                    time.sleep(poll_interval)
+                    continue
+                state = new_state
+                scheduler.clear()
+                for task in engine.tasks:
+                    scheduler.schedule_tree(task, remind_now=True)
+                print(f"{len(engine.task_index)} tarefa(s) monitorada(s)")
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.stop()
+        dispatcher.stop()
+        engine.close()
+
+
+if __name__ == "__main__":
+    run_standalone()
@@ -0,0 +1,94 @@
+"""
+Tarefas recorrentes
+
+A regra fica nos extras da tarefa, por exemplo
+"recurrence": {"freq": "weekly", "interval": 1}, com "freq" sendo "daily"
+(a cada N dias), "weekly" (a cada N semanas), "monthly" (a cada N meses, no
+mesmo dia do mês) ou "weekdays" (de segunda a sexta).
+
+Só a ocorrência atual existe como tarefa. Quando ela é concluída, o
+TaskEngine cria a próxima (com o prazo calculado aqui) e passa a regra para
+ela; as ocorrências futuras nunca são gravadas. O notificador expande a
+regra apenas dentro da sua janela de lembretes (`occurrences_until`).
+"""
+
+import calendar
+from datetime import datetime, timedelta
+
+FREQUENCIES = {
+    "daily": "Diária",
+    "weekly": "Semanal",
+    "monthly": "Mensal",
+    "weekdays": "Dias úteis",
+}
+
+# Rótulo de "a cada N ..." para intervalos maiores que 1
+INTERVAL_UNITS = {"daily": "dias", "weekly": "semanas", "monthly": "meses"}
+
+
+def make_rule(freq, interval=1, deadline_ts=None):
+    """Regra de repetição, ou None se `freq` não for uma frequência conhecida"""
+    if freq not in FREQUENCIES:
+        return None
+    rule = {"freq": freq, "interval": max(1, int(interval))}
+    if freq == "monthly" and deadline_ts is not None:
+        # Dia do mês fixo: 31/01 -> 28/02 -> 31/03, sem ir escorregando
+        rule["day"] = datetime.fromtimestamp(deadline_ts).day
+    return rule
+
+
+def rule_of(task):
+    return task.extra.get("recurrence") if task.extra else None
+
+
+def describe(rule):
+    """Texto curto da regra para a interface ("Semanal", "A cada 3 dias"...)"""
+    interval = rule.get("interval", 1)
+    if interval > 1 and rule["freq"] in INTERVAL_UNITS:
+        return f"A cada {interval} {INTERVAL_UNITS[rule['freq']]}"
+    return FREQUENCIES.get(rule["freq"], rule["freq"])
+
+
+def add_months(moment, months, day):
+    month_index = moment.month - 1 + months
+    year, month = moment.year + month_index // 12, month_index % 12 + 1
+    return moment.replace(year=year, month=month,
+                          day=min(day, calendar.monthrange(year, month)[1]))
+
+
+def next_occurrence(rule, deadline_ts):
+    """Prazo da ocorrência seguinte à de prazo `deadline_ts` (mesma hora local)"""
+    moment = datetime.fromtimestamp(deadline_ts)
+    freq = rule["freq"]
+    interval = rule.get("interval", 1)
+
+    if freq == "daily":
+        moment += timedelta(days=interval)
+    elif freq == "weekly":
+        moment += timedelta(weeks=interval)
+    elif freq == "monthly":
+        moment = add_months(moment, interval, rule.get("day", moment.day))
+    elif freq == "weekdays":
+        moment += timedelta(days=1)
+        while moment.weekday() >= 5:
+            moment += timedelta(days=1)
+    else:
+        raise ValueError(f"frequência de repetição desconhecida: {freq!r}")
+    return moment.timestamp()
+
+
+def next_after(rule, deadline_ts, not_before):
+    """Primeira ocorrência depois de `deadline_ts` que não cai antes de `not_before`
+    (uma tarefa concluída com atraso não gera ocorrências já vencidas)"""
+    deadline_ts = next_occurrence(rule, deadline_ts)
+    while deadline_ts < not_before:
+        deadline_ts = next_occurrence(rule, deadline_ts)
+    return deadline_ts
+
+
+def occurrences_until(rule, deadline_ts, until_ts):
+    """Prazos das ocorrências seguintes até `until_ts`, gerados sob demanda"""
+    deadline_ts = next_occurrence(rule, deadline_ts)
+    while deadline_ts <= until_ts:
+        yield deadline_ts
+        deadline_ts = next_occurrence(rule, deadline_ts)
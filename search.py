@@ -0,0 +1,117 @@
+"""
+Índice invertido para a busca de tarefas
+
+Cada palavra (sem acentos e sem diferenciar maiúsculas) aponta para o
+conjunto de ids das tarefas que a contêm. A busca casa prefixos: "reun"
+encontra "Reunião".
+"""
+
+import re
+import unicodedata
+from bisect import bisect_left, insort
+
+WORD_RE = re.compile(r"\w+")
+# Acentos (marcas combinantes) que sobram após a decomposição NFKD
+COMBINING_RE = re.compile("[\u0300-\u036f]")
+
+
+def normalize(text):
+    """Remover acentos e diferenças de maiúsculas/minúsculas"""
+    if not text.isascii():
+        text = COMBINING_RE.sub("", unicodedata.normalize("NFKD", text))
+    return text.casefold()
+
+
+def tokenize(text):
+    """Palavras normalizadas e sem repetição do texto"""
+    return set(WORD_RE.findall(normalize(text)))
+
+
+class SearchIndex:
+    """Índice invertido palavra -> ids, atualizado tarefa a tarefa.
+
+    As palavras de cada tarefa não são guardadas: para remover ou atualizar,
+    o texto antigo é tokenizado de novo. Assim cada palavra existe uma única
+    vez na memória (a chave em `postings`, a mesma usada em `words`).
+    """
+
+    def __init__(self):
+        self.postings = {}
+        # Vocabulário ordenado para busca por prefixo com bisect
+        self.words = []
+
+    def clear(self):
+        self.postings.clear()
+        self.words = []
+
+    def add(self, task_id, text, sort_words=True):
+        for word in tokenize(text):
+            ids = self.postings.get(word)
+            if ids is None:
+                ids = self.postings[word] = set()
+                if sort_words:
+                    insort(self.words, word)
+            ids.add(task_id)
+
+    def remove(self, task_id, text):
+        """Tirar a tarefa do índice; `text` é o texto com que ela foi indexada"""
+        for word in tokenize(text):
+            ids = self.postings.get(word)
+            if ids is None:
+                continue
+            ids.discard(task_id)
+            if not ids:
+                del self.postings[word]
+                del self.words[bisect_left(self.words, word)]
+
+    def update(self, task_id, old_text, text):
+        self.remove(task_id, old_text)
+        self.add(task_id, text)
+
+    def add_tree(self, task):
+        """Indexar uma tarefa e todas as suas subtarefas"""
+        stack = [task]
+        while stack:
+            node = stack.pop()
+            self.add(node.id, node.full_text())
+            stack.extend(node.subtasks)
+
+    def build(self, tasks):
+        """Indexar a coleção inteira de uma vez (ordena o vocabulário só no final)"""
+        stack = list(tasks)
+        while stack:
+            node = stack.pop()
+            self.add(node.id, node.full_text(), sort_words=False)
+            stack.extend(node.subtasks)
+        self.words = sorted(self.postings)
+
+    def remove_tree(self, task):
+        """Tirar do índice uma tarefa e suas subtarefas (pelos textos atuais)"""
+        stack = [task]
+        while stack:
+            node = stack.pop()
+            self.remove(node.id, node.full_text())
+            stack.extend(node.subtasks)
+
+    def prefix_matches(self, prefix):
+        """Ids das tarefas com alguma palavra começando por `prefix`"""
+        ids = set()
+        i = bisect_left(self.words, prefix)
+        while i < len(self.words) and self.words[i].startswith(prefix):
+            ids |= self.postings[self.words[i]]
+            i += 1
+        return ids
+
+    def search(self, query):
+        """Ids das tarefas que contêm todas as palavras (prefixos) da busca"""
+        terms = sorted(tokenize(query), key=len, reverse=True)
+        if not terms:
+            return set()
+
+        # Termos mais longos costumam ser mais seletivos: começar por eles
+        result = self.prefix_matches(terms[0])
+        for term in terms[1:]:
+            if not result:
+                break
+            result &= self.prefix_matches(term)
+        return result
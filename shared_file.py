@@ -0,0 +1,191 @@
+"""
+Arquivo de tarefas compartilhado entre processos
+
+Duas instâncias do programa (ou uma ferramenta de sincronização) podem
+mexer no mesmo tasks_data.json. Para que uma não apague as alterações da
+outra:
+
+- toda leitura/gravação do arquivo acontece com um lock consultivo
+  (FileLock, no arquivo tasks_data.json.lock);
+- o backend guarda a assinatura (mtime, inode, tamanho) do arquivo que ele
+  mesmo leu ou gravou; se ela mudou, o arquivo foi alterado por fora e a
+  gravação espera a mesclagem em vez de sobrescrevê-lo;
+- a mesclagem é por id de tarefa: comparando o estado de cada tarefa na
+  última sincronização (base), no disco e na memória, `external_changes`
+  gera só as operações que trazem as alterações de fora. Quando os dois
+  lados alteraram a mesma tarefa, vale a versão local.
+
+Os textos longos em arquivo à parte ("text_store": "mmap", ver
+text_store.py) continuam sendo de um único processo.
+
+Cada operação é um dicionário: {"op": "add", "parent_id", "after", "task"},
+{"op": "update", "id", "fields"}, {"op": "move", "id", "parent_id", "after"}
+ou {"op": "delete", "id"}, com "after" sendo o id do irmão anterior (None
+para o primeiro) e "fields" no formato de TaskEngine.update_fields.
+"""
+
+import json
+import os
+
+from task_model import Task
+from text_store import inline_text
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+# Campos comparados na mesclagem (atributos de Task)
+MERGED_FIELDS = ("text", "status", "created_ts", "deadline_ts", "extra")
+
+
+class FileLock:
+    """Lock exclusivo entre processos (não é reentrante dentro do mesmo processo)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, 'a+b')
+        if fcntl:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+        self.file = None
+
+
+def file_signature(path):
+    """(mtime, inode, tamanho) do arquivo, ou None se ele não existe.
+
+    A gravação atômica troca o inode, então a assinatura muda mesmo quando
+    o relógio do sistema de arquivos tem pouca resolução.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+
+
+def task_fingerprint(task):
+    """Resumo dos campos da própria tarefa (sem as subtarefas).
+
+    Um texto no arquivo de textos entra como (prévia, tamanho), tanto ligado
+    (`text_ref`) quanto recém-lido do disco ("text_ref" nos extras).
+    """
+    text = task.text
+    extra = task.extra
+    if task.text_ref is not None:
+        text = (text, task.text_ref[2])
+    elif extra and "text_ref" in extra:
+        text = (text, extra["text_ref"][2])
+        extra = {key: value for key, value in extra.items() if key != "text_ref"} or None
+    extra = json.dumps(extra, sort_keys=True, ensure_ascii=False) if extra else None
+    return hash((text, task.status, task.created_ts, task.deadline_ts, extra))
+
+
+def tree_state(tasks):
+    """id -> (id do pai, id do irmão anterior, resumo dos campos), em pré-ordem"""
+    state = {}
+    stack = [(tasks, None)]
+    while stack:
+        siblings, parent_id = stack.pop()
+        previous_id = None
+        for task in siblings:
+            state[task.id] = (parent_id, previous_id, task_fingerprint(task))
+            previous_id = task.id
+        for task in reversed(siblings):
+            if task.subtasks:
+                stack.append((task.subtasks, task.id))
+    return state
+
+
+def tree_nodes(tasks):
+    """id -> tarefa, em pré-ordem (pais antes dos filhos)"""
+    nodes = {}
+    stack = list(reversed(tasks))
+    while stack:
+        task = stack.pop()
+        nodes[task.id] = task
+        stack.extend(reversed(task.subtasks))
+    return nodes
+
+
+def external_changes(base, theirs, ours, path):
+    """Operações que trazem para `ours` (memória) o que mudou de `base` para
+    `theirs` (disco). Retorna (operações, há alterações locais a gravar)."""
+    their_state = tree_state(theirs)
+    our_state = tree_state(ours)
+    their_nodes = tree_nodes(theirs)
+    our_nodes = tree_nodes(ours)
+    local_changes = (any(our_state.get(task_id) != state for task_id, state in base.items())
+                     or any(task_id not in base for task_id in our_state))
+
+    ops = []
+    for task_id, (parent_id, after, fingerprint) in their_state.items():
+        before = base.get(task_id)
+        ours_now = our_state.get(task_id)
+        if before == (parent_id, after, fingerprint):
+            continue
+
+        if before is None:
+            if ours_now is None:
+                task = their_nodes[task_id]
+                ops.append({"op": "add", "parent_id": parent_id, "after": after,
+                            "task": detached_copy(task, path)})
+            continue
+        if ours_now is None:
+            # Excluída aqui: a exclusão local vale
+            continue
+
+        if before[2] != fingerprint and ours_now[2] == before[2]:
+            fields = changed_fields(our_nodes[task_id], detached_copy(their_nodes[task_id], path))
+            if fields:
+                ops.append({"op": "update", "id": task_id, "fields": fields})
+        if before[:2] != (parent_id, after) and ours_now[:2] == before[:2]:
+            ops.append({"op": "move", "id": task_id, "parent_id": parent_id, "after": after})
+
+    # Exclusões: só se nada na subárvore local mudou desde a base
+    for task_id in base:
+        if task_id in their_state or task_id not in our_nodes:
+            continue
+        subtree = tree_nodes([our_nodes[task_id]])
+        if all(our_state[node_id] == base.get(node_id) for node_id in subtree):
+            ops.append({"op": "delete", "id": task_id})
+
+    return ops, local_changes
+
+
+def changed_fields(ours, theirs):
+    """Campos de `theirs` diferentes dos de `ours` (o texto é comparado por inteiro)"""
+    fields = {name: getattr(theirs, name) for name in MERGED_FIELDS[1:]
+              if getattr(theirs, name) != getattr(ours, name)}
+    if theirs.text != ours.full_text():
+        fields["text"] = theirs.text
+    return fields
+
+
+def detached_copy(task, path):
+    """Cópia da tarefa sem as subtarefas (elas chegam em operações próprias),
+    com o texto longo trazido do arquivo de textos de quem gravou"""
+    copy = Task(task.id, task.text, task.status, task.created_ts, task.deadline_ts,
+                [], dict(task.extra) if task.extra else None)
+    if copy.extra and "text_ref" in copy.extra:
+        try:
+            inline_text(copy, path)
+        except OSError as e:
+            print(f"Erro ao ler o texto da tarefa {task.id}: {e}")
+    return copy
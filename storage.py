@@ -0,0 +1,933 @@
+"""
+Camada de armazenamento das tarefas
+
+Backends disponíveis: "json" (arquivo inteiro), "journal" (JSON + diário de
+operações) e "sqlite" (uma linha por tarefa).
+
+Cada backend implementa a mesma interface usada pelo TaskManagerApp:
+load / save_all (coleção inteira) e add_task / update_task / delete_task /
+move_task (uma tarefa por vez), apply_batch (várias dessas operações
+gravadas de uma vez, em uma única transação), além de flush e close.
+
+O TaskManagerApp não chama o backend diretamente: BackgroundWriter expõe a
+mesma interface e executa tudo em uma thread própria.
+
+Os backends "json" e "journal" gravam o arquivo de tarefas no formato
+configurado (ver data_format.py); a leitura detecta o formato sozinha. O
+backend "json" também pode guardar os textos longos fora do arquivo, em um
+arquivo mapeado em memória (ver text_store.py).
+
+O backend "json" pode ser usado por mais de um processo ao mesmo tempo:
+ele não sobrescreve alterações feitas por fora no arquivo e entrega essas
+alterações ao TaskEngine por `pull_changes` (ver shared_file.py). Os outros
+backends retornam None em `pull_changes`.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from data_format import decode, encode
+from shared_file import FileLock, external_changes, file_signature, tree_state
+from task_model import Task, task_to_json
+from text_store import TextStore, inline_texts
+
+# Campos que possuem coluna própria na tabela do SQLite
+TASK_FIELDS = ("id", "text", "status", "created", "deadline", "deadline_timestamp")
+
+# Operações que alteram uma única tarefa (ou um lote delas)
+TASK_OPERATIONS = ("add_task", "update_task", "delete_task", "move_task", "apply_batch")
+
+
+class Storage:
+    """Comportamento padrão dos backends: gravações síncronas, feitas por um
+    único processo (ou já serializadas pelo próprio banco, no SQLite)"""
+
+    # Alterações pontuais podem ser agrupadas em uma única regravação?
+    rewrites_all = False
+
+    def prepare(self, method, args):
+        """Primeira parte de uma operação, com o lock das tarefas adquirido:
+        tirar das tarefas tudo o que a gravação precisa. Retorna a função que
+        grava (chamada depois, já sem o lock). Por padrão tudo roda aqui."""
+        value = getattr(self, method)(*args)
+        return lambda: value
+
+    def changed_on_disk(self):
+        return False
+
+    def pull_changes(self, tasks):
+        return None
+
+    def flush(self):
+        """Gravações já são síncronas"""
+
+    def close(self):
+        """Nenhum arquivo fica aberto"""
+
+
+class JsonStorage(Storage):
+    """Backend original: o arquivo JSON inteiro é regravado a cada alteração"""
+
+    # Alterações pontuais podem ser agrupadas em uma única regravação
+    rewrites_all = True
+
+    def __init__(self, path, data_format="pretty", texts=None):
+        self.path = path
+        self.data_format = data_format
+        # TextStore dos textos longos, ou None para manter tudo em memória
+        self.texts = texts
+        self.tasks = []
+        # Lock entre processos e assinatura do arquivo da última leitura/gravação
+        # (sem leitura ainda, o arquivo não é comparado)
+        self.file_lock = FileLock(path + ".lock")
+        self.loaded = False
+        self.signature = None
+        # Erro da leitura do arquivo; enquanto houver, nada é gravado por cima dele
+        self.read_error = None
+        # Estado de cada tarefa na última sincronização com o disco (ver shared_file.py)
+        self.base = {}
+        # Arquivos de textos compactados, a apagar na próxima gravação
+        self.old_generations = []
+
+    def load(self):
+        with self.file_lock:
+            self.signature = file_signature(self.path)
+            try:
+                self.tasks = self.read()
+                self.read_error = None
+            except Exception as e:
+                print(f"Erro ao ler o arquivo de tarefas {self.path}: {e}")
+                self.tasks = []
+                self.read_error = e
+            self.loaded = True
+        if self.texts:
+            self.texts.attach(self.tasks)
+        else:
+            inline_texts(self.tasks, self.path)
+        self.base = tree_state(self.tasks)
+        return self.tasks
+
+    def read(self):
+        """Tarefas do arquivo, sem resolver as referências a textos externos.
+        Lança a exceção de decode se o conteúdo não puder ser lido."""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        return decode(data) if data.strip() else []
+
+    def save_all(self, tasks):
+        """Gravar o arquivo inteiro, a menos que outro processo o tenha alterado:
+        nesse caso nada é gravado até o TaskEngine mesclar (pull_changes)"""
+        self.prepare_save(tasks)()
+
+    def prepare(self, method, args):
+        if method in TASK_OPERATIONS:
+            return self.prepare_save(self.tasks)
+        if method == "save_all":
+            return self.prepare_save(*args)
+        return super().prepare(method, args)
+
+    def prepare_save(self, tasks):
+        """Codificar as tarefas; retorna a função que grava o arquivo"""
+        self.tasks = tasks
+        if self.read_error is not None:
+            # Gravar agora trocaria as tarefas que não puderam ser lidas pelas da memória
+            raise OSError(f"{self.path} não pôde ser lido ({self.read_error}); "
+                          "as alterações não foram gravadas")
+        if self.changed_on_disk():
+            return lambda: None
+        if self.texts:
+            # Os textos longos mudam para o arquivo de textos nas próprias tarefas
+            live = self.texts.externalize(tasks)
+            old_generation = self.texts.compact(tasks, live)
+            if old_generation is not None:
+                self.old_generations.append(old_generation)
+        data = encode(tasks, self.data_format)
+        state = tree_state(tasks)
+
+        def write():
+            with self.file_lock:
+                if self.changed_on_disk():
+                    return
+                write_data_atomic(self.path, data)
+                # Arquivos de textos antigos só saem depois de o arquivo de
+                # tarefas apontar para o novo
+                while self.old_generations:
+                    self.texts.remove(self.old_generations.pop())
+                self.signature = file_signature(self.path)
+                self.loaded = True
+            self.base = state
+        return write
+
+    def changed_on_disk(self):
+        """O arquivo mudou desde a última leitura/gravação deste processo?"""
+        return self.loaded and file_signature(self.path) != self.signature
+
+    def pull_changes(self, tasks):
+        """Ler as alterações feitas por outro processo no arquivo.
+
+        Retorna None se o arquivo não mudou ou não pôde ser lido (ex.: uma
+        ferramenta de sincronização no meio da gravação): a assinatura antiga
+        fica, e a mesclagem é tentada de novo na próxima verificação. Senão
+        retorna (operações, há alterações locais a gravar), e o arquivo lido
+        passa a ser a base da próxima mesclagem.
+        """
+        with self.file_lock:
+            if not self.changed_on_disk():
+                return None
+            signature = file_signature(self.path)
+            try:
+                theirs = self.read()
+            except Exception as e:
+                print(f"Erro ao ler as alterações do arquivo de tarefas: {e}")
+                return None
+            self.signature = signature
+        changes = external_changes(self.base, theirs, tasks, self.path)
+        self.base = tree_state(theirs)
+        return changes
+
+    def add_task(self, task, parent_id=None):
+        self.save_all(self.tasks)
+
+    def update_task(self, task):
+        self.save_all(self.tasks)
+
+    def delete_task(self, task):
+        self.save_all(self.tasks)
+
+    def move_task(self, task, parent_id, index):
+        self.save_all(self.tasks)
+
+    def apply_batch(self, operations):
+        """As tarefas em memória já têm todas as alterações: uma regravação basta"""
+        self.save_all(self.tasks)
+
+    def close(self):
+        if self.texts:
+            self.texts.close()
+
+
+class SQLiteStorage(Storage):
+    """Backend SQLite (modo WAL): uma linha por tarefa, gravações pontuais"""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        # Profundidade de transaction(): só a mais externa faz o commit
+        self.transaction_depth = 0
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                parent_id TEXT,
+                position REAL NOT NULL,
+                text TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created TEXT,
+                deadline TEXT,
+                deadline_timestamp REAL,
+                extra TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_tasks_parent ON tasks (parent_id, position);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self.conn.commit()
+
+    def load(self):
+        return load_sqlite_tasks(self.conn)
+
+    def save_all(self, tasks):
+        self.replace_rows(self.tree_rows(tasks))
+
+    def add_task(self, task, parent_id=None):
+        self.add_rows(self.subtree_rows(task, parent_id))
+
+    def update_task(self, task):
+        self.update_row(self.row_values(task))
+
+    def prepare(self, method, args):
+        """Os valores das linhas saem das tarefas com o lock; o SQL roda depois"""
+        if method == "save_all":
+            rows = self.tree_rows(*args)
+            return lambda: self.replace_rows(rows)
+        if method == "add_task":
+            rows = self.subtree_rows(*args)
+            return lambda: self.add_rows(rows)
+        if method == "update_task":
+            values = self.row_values(*args)
+            return lambda: self.update_row(values)
+        if method == "apply_batch":
+            writes = [self.prepare(name, op_args) for name, op_args in args[0]]
+            return lambda: self.run_batch(writes)
+        if method in ("delete_task", "move_task"):
+            # Só usam o id da tarefa
+            return lambda: getattr(self, method)(*args)
+        return super().prepare(method, args)
+
+    def replace_rows(self, rows):
+        with self.transaction():
+            self.conn.execute("DELETE FROM tasks")
+            self.insert_rows(rows)
+
+    def add_rows(self, rows):
+        """Inserir as linhas de uma subárvore, com a raiz no fim dos irmãos"""
+        with self.transaction():
+            position = self.conn.execute(
+                "SELECT COALESCE(MAX(position), -1) + 1 FROM tasks WHERE parent_id IS ?",
+                (rows[0][1],)
+            ).fetchone()[0]
+            rows[0] = rows[0][:2] + (position,) + rows[0][3:]
+            self.insert_rows(rows)
+
+    def update_row(self, values):
+        with self.transaction():
+            self.conn.execute(
+                "UPDATE tasks SET text = ?, status = ?, created = ?, deadline = ?, "
+                "deadline_timestamp = ?, extra = ? WHERE id = ?",
+                values[1:] + values[:1]
+            )
+
+    def delete_task(self, task):
+        with self.transaction():
+            self.conn.execute("""
+                WITH RECURSIVE subtree(id) AS (
+                    SELECT ?
+                    UNION ALL
+                    SELECT tasks.id FROM tasks JOIN subtree ON tasks.parent_id = subtree.id
+                )
+                DELETE FROM tasks WHERE id IN subtree
+            """, (task.id,))
+
+    def move_task(self, task, parent_id, index):
+        """Mover a tarefa alterando somente a sua linha (parent_id e position).
+
+        Quando não cabe mais uma posição entre os dois vizinhos (o ponto médio
+        coincide com um deles), os irmãos são renumerados 0, 1, 2...
+        """
+        with self.transaction():
+            rows = self.conn.execute(
+                "SELECT id, position FROM tasks WHERE parent_id IS ? AND id != ? ORDER BY position",
+                (parent_id, task.id)
+            ).fetchall()
+            positions = [row[1] for row in rows]
+
+            if not positions:
+                position = 0
+            elif index <= 0:
+                position = positions[0] - 1
+            elif index >= len(positions):
+                position = positions[-1] + 1
+            else:
+                position = (positions[index - 1] + positions[index]) / 2
+                if not positions[index - 1] < position < positions[index]:
+                    ids = [row[0] for row in rows]
+                    ids.insert(index, task.id)
+                    self.conn.executemany(
+                        "UPDATE tasks SET parent_id = ?, position = ? WHERE id = ?",
+                        [(parent_id, i, task_id) for i, task_id in enumerate(ids)]
+                    )
+                    return
+
+            self.conn.execute(
+                "UPDATE tasks SET parent_id = ?, position = ? WHERE id = ?",
+                (parent_id, position, task.id)
+            )
+
+    def apply_batch(self, operations):
+        """Executar várias operações (método, argumentos) em uma única transação"""
+        with self.transaction():
+            for method, args in operations:
+                getattr(self, method)(*args)
+
+    def run_batch(self, writes):
+        with self.transaction():
+            for write in writes:
+                write()
+
+    @contextmanager
+    def transaction(self):
+        """Transação que pode ser aninhada: commit/rollback só no nível mais externo"""
+        if self.transaction_depth:
+            self.transaction_depth += 1
+            try:
+                yield
+            finally:
+                self.transaction_depth -= 1
+            return
+
+        self.transaction_depth = 1
+        try:
+            with self.conn:
+                yield
+        finally:
+            self.transaction_depth = 0
+
+    def insert_rows(self, rows):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO tasks (id, parent_id, position, text, status, created, "
+            "deadline, deadline_timestamp, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+
+    def tree_rows(self, tasks):
+        """Linhas de todas as tarefas da coleção"""
+        rows = []
+        for position, task in enumerate(tasks):
+            rows += self.subtree_rows(task, None, position)
+        return rows
+
+    def subtree_rows(self, task, parent_id=None, position=None):
+        """Linhas (id, parent_id, position, ...) da tarefa e de suas subtarefas"""
+        rows = []
+        stack = [(task, parent_id, position)]
+        while stack:
+            node, node_parent_id, node_position = stack.pop()
+            values = self.row_values(node)
+            rows.append((values[0], node_parent_id, node_position) + values[1:])
+            stack.extend((subtask, node.id, i) for i, subtask in enumerate(node.subtasks))
+        return rows
+
+    def row_values(self, task):
+        """(id, text, status, created, deadline, deadline_timestamp, extra)"""
+        fields = task.fields()
+        extra = {key: value for key, value in fields.items() if key not in TASK_FIELDS}
+        return (
+            task.id, task.text, task.status, fields.get("created"),
+            fields.get("deadline"), task.deadline_ts,
+            json.dumps(extra, ensure_ascii=False) if extra else None
+        )
+
+    def get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def close(self):
+        self.conn.close()
+
+
+class JournalStorage(Storage):
+    """Backend JSON com diário de operações (append-only).
+
+    Cada alteração vira uma linha JSON no arquivo de log, gravada com fsync.
+    Quando o log passa de max_log_bytes, uma thread em segundo plano compacta
+    snapshot + log de volta no arquivo JSON principal.
+    """
+
+    def __init__(self, path, max_log_bytes=1024 * 1024, data_format="pretty"):
+        self.path = path
+        self.data_format = data_format
+        self.log_path = path + ".log"
+        # Log já rotacionado aguardando compactação
+        self.old_log_path = path + ".log.old"
+        self.max_log_bytes = max_log_bytes
+        self.lock = threading.Lock()
+        self.compaction_thread = None
+        self.log_file = None
+        # Erro da leitura do snapshot; enquanto houver, ele não é regravado
+        self.read_error = None
+
+    def load(self):
+        snapshot = JsonStorage(self.path, self.data_format)
+        tasks = snapshot.load()
+        self.read_error = snapshot.read_error
+        nodes, parents = build_tree_index(tasks)
+        for log_path in (self.old_log_path, self.log_path):
+            for op in read_journal(log_path):
+                apply_operation(tasks, nodes, parents, op)
+
+        self.log_file = open(self.log_path, 'a', encoding='utf-8')
+        # Sobrou um log rotacionado de uma compactação interrompida
+        if os.path.exists(self.old_log_path):
+            self.start_compaction(rotate=False)
+        return tasks
+
+    def save_all(self, tasks):
+        """Gravar um snapshot completo e começar um log vazio"""
+        self.write_snapshot(encode(tasks, self.data_format))
+
+    def prepare(self, method, args):
+        """O snapshot ou a linha do diário são codificados com o lock das
+        tarefas; a gravação (com fsync) fica para depois"""
+        if method == "save_all":
+            data = encode(args[0], self.data_format)
+            return lambda: self.write_snapshot(data)
+        if method in JOURNAL_OPERATIONS:
+            line = journal_line(JOURNAL_OPERATIONS[method](*args))
+            return lambda: self.append_line(line)
+        return super().prepare(method, args)
+
+    def write_snapshot(self, data):
+        if self.read_error is not None:
+            # O log continua recebendo as operações; o snapshot ilegível fica como está
+            raise OSError(f"{self.path} não pôde ser lido ({self.read_error}); "
+                          "o snapshot não foi regravado")
+        self.wait_compaction()
+        with self.lock:
+            write_data_atomic(self.path, data)
+            if self.log_file:
+                self.log_file.close()
+            self.log_file = open(self.log_path, 'w', encoding='utf-8')
+            fsync_file(self.log_file)
+
+    def add_task(self, task, parent_id=None):
+        self.append(add_operation(task, parent_id))
+
+    def update_task(self, task):
+        self.append(update_operation(task))
+
+    def delete_task(self, task):
+        self.append(delete_operation(task))
+
+    def move_task(self, task, parent_id, index):
+        self.append(move_operation(task, parent_id, index))
+
+    def apply_batch(self, operations):
+        """Gravar o lote como uma única linha do diário (aplicada inteira ou não aplicada)"""
+        self.append(batch_operation(operations))
+
+    def append(self, op):
+        self.append_line(journal_line(op))
+
+    def append_line(self, line):
+        with self.lock:
+            self.log_file.write(line)
+            fsync_file(self.log_file)
+            log_size = self.log_file.tell()
+
+        if log_size > self.max_log_bytes:
+            self.start_compaction()
+
+    def start_compaction(self, rotate=True):
+        if self.compaction_thread and self.compaction_thread.is_alive():
+            return
+
+        with self.lock:
+            if rotate:
+                if os.path.exists(self.old_log_path):
+                    return
+                self.log_file.close()
+                os.replace(self.log_path, self.old_log_path)
+                self.log_file = open(self.log_path, 'a', encoding='utf-8')
+
+        self.compaction_thread = threading.Thread(target=self.compact, daemon=True)
+        self.compaction_thread.start()
+
+    def compact(self):
+        """Aplicar o log rotacionado sobre o snapshot (roda fora da thread da interface)"""
+        try:
+            snapshot = JsonStorage(self.path, self.data_format)
+            tasks = snapshot.load()
+            if snapshot.read_error is not None:
+                # Não regravar por cima de um snapshot que não pôde ser lido
+                raise snapshot.read_error
+            nodes, parents = build_tree_index(tasks)
+            for op in read_journal(self.old_log_path):
+                apply_operation(tasks, nodes, parents, op)
+
+            write_tasks_atomic(self.path, tasks, self.data_format)
+            os.remove(self.old_log_path)
+        except Exception as e:
+            print(f"Erro ao compactar o diário de tarefas: {e}")
+
+    def wait_compaction(self):
+        if self.compaction_thread and self.compaction_thread.is_alive():
+            self.compaction_thread.join()
+
+    def close(self):
+        self.wait_compaction()
+        with self.lock:
+            if self.log_file:
+                self.log_file.close()
+                self.log_file = None
+
+
+class BackgroundWriter:
+    """Executa as operações de um backend em uma thread separada da interface.
+
+    O backend é criado pela própria thread (`factory`), pois conexões SQLite
+    não podem ser compartilhadas entre threads. Só a leitura das tarefas
+    (`prepare` do backend: codificar o arquivo, a linha do diário ou as linhas
+    do SQLite) roda com `lock` adquirido, o mesmo lock que a interface usa ao
+    alterar as tarefas; a escrita em disco acontece depois, sem ele.
+
+    Para backends que regravam o arquivo inteiro, alterações seguidas são
+    agrupadas: a gravação acontece `delay` segundos após a última alteração
+    (e no máximo `max_delay` segundos após a primeira).
+    """
+
+    def __init__(self, factory, lock, delay=0.5, max_delay=5.0):
+        self.factory = factory
+        self.lock = lock
+        self.delay = delay
+        self.max_delay = max_delay
+        self.queue = queue.Queue()
+        # Backend criado pela thread (usado fora dela só por changed_on_disk)
+        self.storage = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def load(self):
+        """Carregar as tarefas (bloqueia quem chamou até o fim da leitura)"""
+        return self.call("load")
+
+    def save_all(self, tasks):
+        self.submit("save_all", tasks)
+
+    def add_task(self, task, parent_id=None):
+        self.submit("add_task", task, parent_id)
+
+    def update_task(self, task):
+        self.submit("update_task", task)
+
+    def delete_task(self, task):
+        self.submit("delete_task", task)
+
+    def move_task(self, task, parent_id, index):
+        self.submit("move_task", task, parent_id, index)
+
+    def apply_batch(self, operations):
+        self.submit("apply_batch", operations)
+
+    def changed_on_disk(self):
+        """Consulta rápida, fora da fila: só compara a assinatura do arquivo"""
+        storage = self.storage
+        return storage is not None and storage.changed_on_disk()
+
+    def pull_changes(self, tasks):
+        return self.call("pull_changes", tasks)
+
+    def flush(self):
+        """Esperar até que todas as alterações pendentes estejam gravadas"""
+        self.call("flush")
+
+    def close(self):
+        self.call("close")
+        self.thread.join()
+
+    def submit(self, method, *args):
+        storage = self.storage
+        write = None
+        if method in TASK_OPERATIONS and storage is not None and not storage.rewrites_all:
+            # Diário e SQLite gravam cada operação: o retrato das tarefas é
+            # tirado agora, e não quando a fila chegar a ela (com a tarefa já
+            # alterada de novo)
+            try:
+                with self.lock:
+                    write = storage.prepare(method, args)
+            except Exception as e:
+                print(f"Erro ao gravar tarefas ({method}): {e}")
+                return
+        self.queue.put((method, args, None, write))
+
+    def call(self, method, *args):
+        done = threading.Event()
+        result = {}
+        self.queue.put((method, args, (done, result), None))
+        done.wait()
+        if "error" in result:
+            raise result["error"]
+        return result.get("value")
+
+    def run(self):
+        storage = self.storage = self.factory()
+        dirty_since = None
+        last_change = None
+
+        while True:
+            timeout = None
+            if dirty_since is not None:
+                timeout = max(0, min(last_change + self.delay, dirty_since + self.max_delay) - time.monotonic())
+
+            try:
+                method, args, reply, write = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                self.execute(storage, "save_all", (storage.tasks,))
+                dirty_since = None
+                continue
+
+            if method in TASK_OPERATIONS and storage.rewrites_all:
+                last_change = time.monotonic()
+                dirty_since = dirty_since or last_change
+                continue
+
+            if method in ("flush", "close") and dirty_since is not None:
+                self.execute(storage, "save_all", (storage.tasks,))
+                dirty_since = None
+            elif method == "save_all":
+                dirty_since = None
+
+            value, error = None, None
+            if method != "flush":
+                value, error = self.execute(storage, method, args, write)
+
+            if reply:
+                done, result = reply
+                result["value"] = value
+                if error:
+                    result["error"] = error
+                done.set()
+
+            if method == "close":
+                return
+
+    def execute(self, storage, method, args, write=None):
+        try:
+            if write is None:
+                with self.lock:
+                    write = storage.prepare(method, args)
+            return write(), None
+        except Exception as e:
+            print(f"Erro ao gravar tarefas ({method}): {e}")
+            return None, e
+
+
+class ReadOnlyStorage(Storage):
+    """Leitura das tarefas de qualquer backend, sem gravar nada nem manter
+    arquivos abertos entre leituras.
+
+    Usado pelo notificador em segundo plano (python notifications.py), que
+    relê as tarefas enquanto a janela continua sendo quem grava: não repara
+    ids, não abre o diário para acréscimos nem compacta nada.
+    """
+
+    def __init__(self, backend, data_file):
+        self.backend = backend
+        self.data_file = data_file
+
+    def load(self):
+        if self.backend == "sqlite":
+            db_file = os.path.splitext(self.data_file)[0] + ".db"
+            conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+            try:
+                return load_sqlite_tasks(conn)
+            finally:
+                conn.close()
+
+        tasks = JsonStorage(self.data_file).read()
+        if self.backend == "journal":
+            nodes, parents = build_tree_index(tasks)
+            for log_path in (self.data_file + ".log.old", self.data_file + ".log"):
+                for op in read_journal(log_path):
+                    apply_operation(tasks, nodes, parents, op)
+        inline_texts(tasks, self.data_file)
+        return tasks
+
+    def save_all(self, tasks):
+        """Somente leitura: nada é gravado"""
+
+
+def fsync_file(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def write_tasks_atomic(path, tasks, data_format="pretty"):
+    write_data_atomic(path, encode(tasks, data_format))
+
+
+def write_data_atomic(path, data):
+    """Gravar em arquivo temporário e renomear por cima do original"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        fsync_file(f)
+    os.replace(tmp_path, path)
+
+
+def read_journal(log_path):
+    """Ler as operações do log, ignorando uma última linha incompleta"""
+    if not os.path.exists(log_path):
+        return
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def build_tree_index(tasks):
+    """Montar os dicionários id -> tarefa e id -> id do pai"""
+    nodes = {}
+    parents = {}
+    stack = [(task, None) for task in tasks]
+    while stack:
+        task, parent_id = stack.pop()
+        nodes[task.id] = task
+        parents[task.id] = parent_id
+        for subtask in task.subtasks:
+            stack.append((subtask, task.id))
+    return nodes, parents
+
+
+def add_operation(task, parent_id=None):
+    return {"op": "add", "parent_id": parent_id, "task": task}
+
+
+def update_operation(task):
+    fields = task.fields()
+    del fields["id"]
+    return {"op": "update", "id": task.id, "fields": fields}
+
+
+def delete_operation(task):
+    return {"op": "delete", "id": task.id}
+
+
+def move_operation(task, parent_id, index):
+    return {"op": "move", "id": task.id, "parent_id": parent_id, "index": index}
+
+
+# Linha do diário de cada operação do backend
+def batch_operation(operations):
+    return {"op": "batch", "ops": [
+        JOURNAL_OPERATIONS[method](*args) for method, args in operations
+    ]}
+
+
+def journal_line(op):
+    return json.dumps(op, ensure_ascii=False, default=task_to_json) + "\n"
+
+
+JOURNAL_OPERATIONS = {
+    "add_task": add_operation,
+    "update_task": update_operation,
+    "delete_task": delete_operation,
+    "move_task": move_operation,
+    "apply_batch": batch_operation,
+}
+
+
+def apply_operation(tasks, nodes, parents, op):
+    """Aplicar uma operação do diário. Reaplicar a mesma operação não tem efeito."""
+    kind = op.get("op")
+    if kind == "batch":
+        for batch_op in op["ops"]:
+            apply_operation(tasks, nodes, parents, batch_op)
+        return
+
+    task_id = op.get("id") or op.get("task", {}).get("id")
+
+    def siblings_of(parent_id):
+        if parent_id is None:
+            return tasks
+        parent = nodes.get(parent_id)
+        return parent.subtasks if parent else None
+
+    def detach(task_id):
+        siblings = siblings_of(parents.get(task_id))
+        if siblings is not None:
+            for i, sibling in enumerate(siblings):
+                if sibling.id == task_id:
+                    del siblings[i]
+                    return
+
+    if kind == "add":
+        siblings = siblings_of(op.get("parent_id"))
+        if siblings is None:
+            return
+        if task_id in nodes:
+            detach(task_id)
+        task = Task.from_dict(op["task"])
+        siblings.append(task)
+        added_nodes, added_parents = build_tree_index([task])
+        added_parents[task_id] = op.get("parent_id")
+        nodes.update(added_nodes)
+        parents.update(added_parents)
+
+    elif kind == "update":
+        if task_id in nodes:
+            # A operação traz todos os campos: extras removidos não podem voltar
+            nodes[task_id].update(op["fields"], replace=True)
+
+    elif kind == "delete":
+        if task_id in nodes:
+            detach(task_id)
+            for removed_id in build_tree_index([nodes[task_id]])[0]:
+                nodes.pop(removed_id, None)
+                parents.pop(removed_id, None)
+
+    elif kind == "move":
+        siblings = siblings_of(op.get("parent_id"))
+        if task_id in nodes and siblings is not None:
+            detach(task_id)
+            siblings.insert(op["index"], nodes[task_id])
+            parents[task_id] = op.get("parent_id")
+
+
+def load_sqlite_tasks(conn):
+    """Tarefas da tabela "tasks" do SQLite, montadas em árvore"""
+    rows = conn.execute(
+        "SELECT id, parent_id, text, status, created, deadline, deadline_timestamp, extra "
+        "FROM tasks ORDER BY position"
+    ).fetchall()
+
+    nodes = {}
+    parents = []
+    for task_id, parent_id, text, status, created, deadline, deadline_ts, extra in rows:
+        fields = json.loads(extra) if extra else {}
+        fields.update({"id": task_id, "text": text, "status": status, "created": created})
+        if deadline is not None:
+            fields["deadline"] = deadline
+        if deadline_ts is not None:
+            fields["deadline_timestamp"] = deadline_ts
+        task = Task.from_dict(fields, subtasks=[])
+        nodes[task_id] = task
+        parents.append((task, parent_id))
+
+    # Montar a árvore mantendo a ordem de "position" entre irmãos
+    tasks = []
+    for task, parent_id in parents:
+        parent = nodes.get(parent_id)
+        if parent is None:
+            tasks.append(task)
+        else:
+            parent.subtasks.append(task)
+    return tasks
+
+
+def migrate_json_to_sqlite(storage, json_path):
+    """Importar uma única vez o tasks_data.json existente para o banco SQLite.
+
+    Retorna True se a migração foi feita agora.
+    """
+    if storage.get_meta("migrated_from_json"):
+        return False
+
+    if os.path.exists(json_path):
+        has_rows = storage.conn.execute("SELECT 1 FROM tasks LIMIT 1").fetchone()
+        if not has_rows:
+            tasks = JsonStorage(json_path).load()
+            storage.save_all(tasks)
+            print(f"{len(tasks)} tarefa(s) importada(s) de {json_path}")
+
+    storage.set_meta("migrated_from_json", json_path)
+    return True
+
+
+def create_storage(backend, data_file, max_log_bytes=1024 * 1024, data_format="pretty",
+                   text_store=None):
+    """Criar o backend configurado em app_config.json ("json", "journal" ou "sqlite")"""
+    if backend == "sqlite":
+        db_file = os.path.splitext(data_file)[0] + ".db"
+        storage = SQLiteStorage(db_file)
+        migrate_json_to_sqlite(storage, data_file)
+        return storage
+    if backend == "journal":
+        return JournalStorage(data_file, max_log_bytes, data_format)
+    texts = TextStore(data_file) if text_store == "mmap" else None
+    return JsonStorage(data_file, data_format, texts)
@@ -0,0 +1,669 @@
+"""
+Núcleo do Gerenciador de Tarefas, sem interface gráfica
+
+TaskEngine guarda as tarefas, os índices (id -> tarefa, id -> pai), os
+contadores, o índice de busca e as faixas de prazo, e grava cada alteração
+no backend de armazenamento. A interface (TaskManagerApp), o notificador e
+scripts de teste/benchmark usam a mesma classe.
+
+Quem precisa reagir a alterações se inscreve com `subscribe`; o callback
+recebe (evento, tarefa, id do pai, **detalhes), com evento "added",
+"updated", "deleted" ou "moved". Os detalhes permitem desfazer a alteração
+(ver history.py): "added"/"deleted" trazem `index` (posição entre os
+irmãos), "updated" traz `previous` (valores anteriores dos campos alterados)
+e "moved" traz `old_parent_id`, `old_index` e `index`.
+
+Alterações feitas dentro de `with engine.batch():` são enviadas ao backend
+de uma só vez, em uma única transação/gravação.
+
+Tarefas com regra de repetição (recurrence.py) têm só a ocorrência atual
+na lista: ao concluí-la, a próxima é criada logo abaixo dela.
+
+Com um TaskArchive (archive.py), tarefas concluídas antigas podem ser
+movidas para o arquivo (`archive_completed`) e trazidas de volta
+(`restore_archived`); para os ouvintes isso aparece como "deleted" e
+"added".
+
+Alterações gravadas no arquivo por outro processo entram com
+`merge_external` (ver shared_file.py): elas chegam aos ouvintes como os
+eventos comuns, só das tarefas alteradas, com o detalhe `external=True`.
+"""
+
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from aggregates import SubtreeAggregates
+from deadlines import DeadlineClassifier
+from recurrence import next_after, rule_of
+from search import SearchIndex
+from task_model import DONE, PENDING, Task, count_tasks, make_task
+
+# Extras que não passam para a próxima ocorrência de uma tarefa recorrente
+OCCURRENCE_SKIP_EXTRA = ("completed_timestamp", "created", "deadline")
+
+
+class TaskEngine:
+    def __init__(self, storage, lock=None, archive=None):
+        self.storage = storage
+        # Arquivo das tarefas concluídas (opcional)
+        self.archive = archive
+        # Lock das tarefas: o backend pode gravar a partir de outra thread
+        self.lock = lock or threading.RLock()
+
+        self.tasks = []
+        # Índices id -> tarefa e id -> id do pai (None para tarefas raiz)
+        self.task_index = {}
+        self.parent_index = {}
+        # Contadores de pendentes/concluídas, ajustados a cada alteração
+        self.task_counts = Counter()
+        self.search_index = SearchIndex()
+        self.deadlines = DeadlineClassifier()
+        # Totais por subárvore (pendentes, concluídas, atrasadas, prazo mais próximo)
+        self.aggregates = SubtreeAggregates(self.deadlines)
+
+        self.listeners = []
+        # Operações do backend acumuladas dentro de batch() (None fora dele)
+        self.pending_ops = None
+        # Ligado enquanto alterações vindas do disco são aplicadas (não se gravam de novo)
+        self.merging = False
+
+    def load(self):
+        """Ler e indexar todas as tarefas do backend"""
+        tasks = self.storage.load()
+        if tasks is None:
+            tasks = []
+
+        with self.lock:
+            self.tasks = tasks
+            if self.build_index():
+                self.storage.save_all(self.tasks)
+
+        self.task_counts = count_tasks(self.tasks)
+        self.search_index.clear()
+        self.search_index.build(self.tasks)
+        self.deadlines.clear()
+        for task in self.tasks:
+            self.deadlines.track_tree(task)
+        self.aggregates.clear()
+        self.aggregates.build(self.tasks)
+        return self.tasks
+
+    def close(self):
+        # Alterações de outro processo gravadas desde a última mesclagem não
+        # podem ser sobrescritas: mesclar antes da gravação final
+        self.storage.flush()
+        self.merge_external()
+        self.storage.close()
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def emit(self, event, task, parent_id, **details):
+        for listener in self.listeners:
+            listener(event, task, parent_id, **details)
+
+    def persist(self, method, *args):
+        """Enviar uma operação ao backend, ou guardá-la se houver um batch aberto"""
+        if self.merging:
+            return
+        if self.pending_ops is not None:
+            self.pending_ops.append((method, args))
+        else:
+            getattr(self.storage, method)(*args)
+
+    @contextmanager
+    def batch(self):
+        """Agrupar várias alterações em uma única gravação no backend"""
+        if self.pending_ops is not None:
+            yield
+            return
+
+        self.pending_ops = []
+        try:
+            yield
+        finally:
+            operations, self.pending_ops = self.pending_ops, None
+            if operations:
+                self.storage.apply_batch(operations)
+
+    # Alterações
+
+    def add_task(self, text, deadline, parent_id=None, recurrence=None, timed=False):
+        """Criar uma tarefa (ou subtarefa de parent_id) com prazo `deadline` (datetime)
+        e, opcionalmente, uma regra de repetição (recurrence.make_rule). Com
+        `timed`, a hora de `deadline` faz parte do prazo."""
+        task = make_task(text, deadline, self.generate_id())
+        extra = {}
+        if recurrence:
+            extra["recurrence"] = recurrence
+        if timed:
+            extra["timed"] = True
+        task.extra = extra or None
+
+        with self.lock:
+            if parent_id is None:
+                self.tasks.append(task)
+            else:
+                self.task_index[parent_id].subtasks.append(task)
+            self.index_task(task, parent_id)
+
+        self.persist("add_task", task, parent_id)
+        self.task_counts[task.status] += 1
+        # `text`, e não task.text: ao gravar, o texto longo pode ter virado prévia
+        self.search_index.add(task.id, text)
+        self.deadlines.track(task)
+        self.aggregates.refresh_path(parent_id, self.task_index, self.parent_index)
+        self.emit("added", task, parent_id, index=len(self.get_siblings(task.id)) - 1)
+        return task
+
+    def insert_task(self, task, parent_id=None, index=None, **details):
+        """Pôr de volta na lista uma tarefa já existente (com suas subtarefas),
+        na posição `index` entre os irmãos (None = no fim)"""
+        if task.id in self.task_index:
+            return None
+        if parent_id is not None and parent_id not in self.task_index:
+            return None
+
+        with self.lock:
+            siblings = self.tasks if parent_id is None else self.task_index[parent_id].subtasks
+            if index is None or index >= len(siblings):
+                index = len(siblings)
+            siblings.insert(index, task)
+            self.index_task(task, parent_id)
+
+        self.persist("add_task", task, parent_id)
+        if index < len(siblings) - 1:
+            # O backend acrescenta no fim: levar para a posição original
+            self.persist("move_task", task, parent_id, index)
+        self.task_counts += count_tasks([task])
+        self.search_index.add_tree(task)
+        self.deadlines.track_tree(task)
+        self.aggregates.build([task])
+        self.aggregates.refresh_path(parent_id, self.task_index, self.parent_index)
+        self.emit("added", task, parent_id, index=index, **details)
+        return task
+
+    def toggle_status(self, task_id):
+        task = self.task_index.get(task_id)
+        if not task:
+            return None
+        return self.set_status(task_id, DONE if task.status == PENDING else PENDING)
+
+    def set_status(self, task_id, status):
+        task = self.task_index.get(task_id)
+        if not task:
+            return None
+
+        # Momento da conclusão, usado para arquivar
+        extra = dict(task.extra or {})
+        if status == DONE:
+            extra["completed_timestamp"] = time.time()
+        else:
+            extra.pop("completed_timestamp", None)
+
+        # Concluir uma tarefa recorrente cria a próxima ocorrência, que leva a regra
+        rule = rule_of(task) if status == DONE and task.deadline_ts is not None else None
+        if rule:
+            del extra["recurrence"]
+
+        with self.batch():
+            self.update_fields(task_id, {"status": status, "extra": extra or None})
+            if rule:
+                self.spawn_occurrence(task, rule)
+        return task
+
+    def set_recurrence(self, task_id, rule):
+        """Definir (ou remover, com None) a regra de repetição; exige prazo"""
+        task = self.task_index.get(task_id)
+        if not task or (rule and task.deadline_ts is None):
+            return None
+
+        extra = dict(task.extra or {})
+        if rule:
+            extra["recurrence"] = rule
+        else:
+            extra.pop("recurrence", None)
+        return self.update_fields(task_id, {"extra": extra or None})
+
+    def spawn_occurrence(self, task, rule):
+        """Criar a próxima ocorrência de uma tarefa recorrente logo depois dela"""
+        today = datetime.combine(datetime.now().date(), datetime.min.time()).timestamp()
+        shift = next_after(rule, task.deadline_ts, today) - task.deadline_ts
+
+        occurrence = self.copy_occurrence(task, shift, set())
+        occurrence.extra = dict(occurrence.extra or {}, recurrence=rule)
+        parent_id = self.parent_index.get(task.id)
+        return self.insert_task(occurrence, parent_id, self.index_of(task.id) + 1)
+
+    def copy_occurrence(self, task, shift, new_ids):
+        """Cópia pendente da tarefa (e subtarefas) com os prazos deslocados em `shift`"""
+        task_id = self.generate_id(new_ids)
+        new_ids.add(task_id)
+        extra = {key: value for key, value in (task.extra or {}).items()
+                 if key not in OCCURRENCE_SKIP_EXTRA}
+        return Task(
+            task_id,
+            task.full_text(),
+            PENDING,
+            datetime.now().replace(second=0, microsecond=0).timestamp(),
+            task.deadline_ts + shift if task.deadline_ts is not None else None,
+            [self.copy_occurrence(subtask, shift, new_ids) for subtask in task.subtasks],
+            extra or None
+        )
+
+    def edit_text(self, task_id, text):
+        return self.update_fields(task_id, {"text": text})
+
+    def update_fields(self, task_id, fields, **details):
+        """Alterar campos da tarefa ("text", "status", "deadline_ts", "extra").
+
+        Os valores devem ser objetos novos (nunca o dict `extra` alterado no
+        lugar), pois os anteriores vão no evento para poderem ser restaurados.
+        """
+        task = self.task_index.get(task_id)
+        if not task:
+            return None
+
+        previous = {}
+        with self.lock:
+            for name, value in fields.items():
+                if name == "text":
+                    previous[name] = task.full_text()
+                    task.set_text(value)
+                else:
+                    previous[name] = getattr(task, name)
+                    setattr(task, name, value)
+
+        if "status" in fields:
+            self.task_counts[previous["status"]] -= 1
+            self.task_counts[task.status] += 1
+
+        self.persist("update_task", task)
+        if "text" in fields:
+            self.search_index.update(task_id, previous["text"], fields["text"])
+        if "deadline_ts" in fields:
+            self.deadlines.track(task)
+        if "status" in fields or "deadline_ts" in fields:
+            self.aggregates.refresh_path(task_id, self.task_index, self.parent_index)
+        self.emit("updated", task, self.parent_index.get(task_id), previous=previous, **details)
+        return task
+
+    def delete_task(self, task_id, **details):
+        """Excluir a tarefa com suas subtarefas e retorná-la"""
+        parent_id = self.parent_index.get(task_id)
+        index = self.index_of(task_id)
+        with self.lock:
+            task = self.remove_task_by_id(task_id)
+            if task:
+                # Ainda sob o lock: os textos longos são relidos para sair do índice
+                self.search_index.remove_tree(task)
+        if not task:
+            return None
+
+        self.persist("delete_task", task)
+        self.task_counts -= count_tasks([task])
+        self.deadlines.untrack_tree(task)
+        self.aggregates.remove_tree(task)
+        self.aggregates.refresh_path(parent_id, self.task_index, self.parent_index)
+        self.emit("deleted", task, parent_id, index=index, **details)
+        return task
+
+    def shift_deadline(self, task_id, days):
+        """Adiar (ou antecipar, com `days` negativo) o prazo da tarefa"""
+        task = self.task_index.get(task_id)
+        if not task or task.deadline_ts is None:
+            return None
+
+        # Somar dias no calendário local (a hora do prazo não muda no horário de verão)
+        deadline = datetime.fromtimestamp(task.deadline_ts) + timedelta(days=days)
+        extra = task.extra
+        if extra and "deadline" in extra:
+            extra = dict(extra)
+            del extra["deadline"]
+        return self.update_fields(task_id, {"deadline_ts": deadline.timestamp(), "extra": extra or None})
+
+    # Alterações em lote (uma gravação para todas)
+
+    def set_status_many(self, task_ids, status):
+        changed = []
+        with self.batch():
+            for task_id in task_ids:
+                task = self.task_index.get(task_id)
+                if task and task.status != status:
+                    changed.append(self.set_status(task_id, status))
+        return changed
+
+    def shift_deadlines(self, task_ids, days):
+        shifted = []
+        with self.batch():
+            for task_id in task_ids:
+                task = self.shift_deadline(task_id, days)
+                if task:
+                    shifted.append(task)
+        return shifted
+
+    def delete_many(self, task_ids, **details):
+        """Excluir várias tarefas; as que estão dentro de outra selecionada vão junto com ela"""
+        selected = set(task_ids)
+        roots = []
+        for task_id in task_ids:
+            ancestor = self.parent_index.get(task_id)
+            while ancestor is not None and ancestor not in selected:
+                ancestor = self.parent_index.get(ancestor)
+            if ancestor is None:
+                roots.append(task_id)
+
+        deleted = []
+        with self.batch():
+            for task_id in roots:
+                task = self.delete_task(task_id, **details)
+                if task:
+                    deleted.append(task)
+        return deleted
+
+    def move_task(self, task_id, new_parent_id=None, position=None, **details):
+        """Mover a tarefa (com suas subtarefas) para outro pai/posição"""
+        old_parent_id = self.parent_index.get(task_id)
+        old_index = self.index_of(task_id)
+        with self.lock:
+            task = self.relocate_task(task_id, new_parent_id, position)
+        if not task:
+            return None
+
+        siblings = self.get_siblings(task_id)
+        index = next(i for i, sibling in enumerate(siblings) if sibling is task)
+        self.persist("move_task", task, new_parent_id, index)
+        self.aggregates.refresh_path(old_parent_id, self.task_index, self.parent_index)
+        self.aggregates.refresh_path(new_parent_id, self.task_index, self.parent_index)
+        self.emit("moved", task, new_parent_id, old_parent_id=old_parent_id,
+                  old_index=old_index, index=index, **details)
+        return task
+
+    def rollover(self, today=None):
+        """Avançar o dia atual; retorna os ids cuja linha precisa ser redesenhada
+        (toda tarefa com prazo, já que os dias restantes mudaram, e os
+        ancestrais das que mudaram de faixa, com novos atrasos)"""
+        previous_day = self.deadlines.today
+        changed = self.deadlines.rollover(today)
+        # A partir das próprias tarefas: o atraso de um pai entra nos seus totais
+        redraw = self.aggregates.refresh_many(changed, self.task_index, self.parent_index)
+        if self.deadlines.today != previous_day:
+            redraw |= self.deadlines.deadline_days.keys()
+        return redraw | changed
+
+    def expire_deadlines(self, now=None):
+        """Prazos com hora que acabaram de passar; retorna os ids cuja linha
+        precisa ser redesenhada (as tarefas e seus ancestrais)"""
+        changed = self.deadlines.expire(now)
+        return changed | self.aggregates.refresh_many(changed, self.task_index, self.parent_index)
+
+    # Alterações de outros processos
+
+    def merge_external(self):
+        """Aplicar as alterações que outro processo gravou no arquivo de tarefas.
+
+        Retorna o número de alterações recebidas. Se também há alterações
+        locais, o resultado da mesclagem é gravado.
+        """
+        if not self.storage.changed_on_disk():
+            return 0
+        changes = self.storage.pull_changes(self.tasks)
+        if changes is None:
+            return 0
+
+        operations, local_changes = changes
+        self.merging = True
+        try:
+            for op in operations:
+                self.apply_external(op)
+        finally:
+            self.merging = False
+
+        if local_changes:
+            self.storage.save_all(self.tasks)
+        return len(operations)
+
+    def apply_external(self, op):
+        kind = op["op"]
+        if kind == "update":
+            self.update_fields(op["id"], op["fields"], external=True)
+        elif kind == "delete":
+            self.delete_task(op["id"], external=True)
+        elif kind == "add":
+            index = self.position_after(op["parent_id"], op["after"])
+            self.insert_task(op["task"], op["parent_id"], index, external=True)
+        elif kind == "move" and not self.is_placed(op["id"], op["parent_id"], op["after"]):
+            index = self.position_after(op["parent_id"], op["after"], op["id"])
+            self.move_task(op["id"], op["parent_id"], index, external=True)
+
+    def is_placed(self, task_id, parent_id, after_id):
+        """A tarefa já está sob `parent_id`, logo depois de `after_id`?
+        (mover um irmão costuma deixar as vizinhas já no lugar)"""
+        index = self.index_of(task_id)
+        if index is None or self.parent_index.get(task_id) != parent_id:
+            return False
+        previous = self.get_siblings(task_id)[index - 1].id if index else None
+        return previous == after_id
+
+    def position_after(self, parent_id, after_id, task_id=None):
+        """Posição logo depois do irmão `after_id` (sem contar a própria tarefa
+        `task_id`); None = no fim, se esse irmão não está mais sob `parent_id`"""
+        if after_id is None:
+            return 0
+        if after_id not in self.task_index or self.parent_index.get(after_id) != parent_id:
+            return None
+        siblings = self.tasks if parent_id is None else self.task_index[parent_id].subtasks
+        others = [sibling for sibling in siblings if sibling.id != task_id]
+        return next(i for i, sibling in enumerate(others) if sibling.id == after_id) + 1
+
+    # Arquivo
+
+    def archived_counts(self):
+        """Totais por status das tarefas arquivadas (do resumo, sem ler o arquivo)"""
+        return self.archive.counts if self.archive else Counter()
+
+    def archive_completed(self, older_than_days, now=None):
+        """Arquivar as tarefas concluídas (com todas as subtarefas) há mais de
+        `older_than_days` dias: tarefas raiz e subtarefas de tarefas pendentes.
+        Retorna as tarefas arquivadas."""
+        if not self.archive:
+            return []
+
+        cutoff = (now or time.time()) - older_than_days * 86400
+        with self.lock:
+            selected = self.archivable_subtrees(cutoff)
+        # O arquivo não usa o arquivo de textos da lista principal
+        for task in selected:
+            self.detach_texts(task)
+        if not selected:
+            return []
+
+        # Gravar o arquivo antes de excluir: uma interrupção no meio deixa a
+        # tarefa nos dois lugares, e a próxima execução a arquiva de novo
+        self.archive.add(selected)
+        self.delete_many([task.id for task in selected], archived=True)
+        return selected
+
+    def archivable_subtrees(self, cutoff):
+        """Subárvores a arquivar. As que estão sob uma tarefa pendente ganham
+        "archived_from": [id do pai, id do irmão anterior que fica na lista]"""
+        selected = []
+        stack = [(None, self.tasks)]
+        while stack:
+            parent, siblings = stack.pop()
+            after = None
+            for task in siblings:
+                if (parent is None or parent.status != DONE) and self.is_archivable(task, cutoff):
+                    if parent is not None:
+                        task.extra = dict(task.extra or {}, archived_from=[parent.id, after])
+                    selected.append(task)
+                else:
+                    after = task.id
+                    stack.append((task, task.subtasks))
+        return selected
+
+    def is_archivable(self, task, cutoff):
+        stack = [task]
+        while stack:
+            node = stack.pop()
+            if node.status != DONE:
+                return False
+            completed = (node.extra or {}).get("completed_timestamp") or node.deadline_ts
+            if completed is None or completed > cutoff:
+                return False
+            stack.extend(node.subtasks)
+        return True
+
+    def restore_archived(self, task_id):
+        """Trazer uma tarefa arquivada de volta para a lista principal: uma
+        subtarefa volta para o seu pai, se ele ainda estiver na lista (senão
+        vira tarefa raiz)"""
+        task = self.archive.find(task_id) if self.archive else None
+        if not task or task_id in self.task_index:
+            return None
+
+        extra = dict(task.extra or {})
+        origin = extra.pop("archived_from", None)
+        parent_id = index = None
+        if origin and origin[0] in self.task_index:
+            parent_id = origin[0]
+            index = self.position_after(parent_id, origin[1])
+
+        # Contar a conclusão a partir de agora: senão o arquivamento da
+        # próxima abertura do programa levaria a tarefa de volta ao arquivo
+        task.extra = dict(extra, completed_timestamp=time.time())
+        self.insert_task(task, parent_id, index, archived=True)
+        # Tirar do arquivo só depois de a tarefa estar gravada na lista principal
+        self.storage.flush()
+        self.archive.remove(task_id)
+        return task
+
+    # Índices
+
+    def build_index(self):
+        """Reconstruir os índices a partir do campo "id" de cada tarefa.
+
+        Tarefas sem id (ou com id repetido) recebem um novo id.
+        Retorna True se algum id foi atribuído.
+        """
+        self.task_index.clear()
+        self.parent_index.clear()
+
+        changed = False
+        stack = [(task, None) for task in reversed(self.tasks)]
+        while stack:
+            task, parent_id = stack.pop()
+            if not task.id or task.id in self.task_index:
+                task.id = self.generate_id()
+                changed = True
+            self.task_index[task.id] = task
+            self.parent_index[task.id] = parent_id
+            for subtask in reversed(task.subtasks):
+                stack.append((subtask, task.id))
+
+        return changed
+
+    def index_task(self, task, parent_id):
+        """Indexar uma tarefa recém-inserida e suas subtarefas"""
+        self.task_index[task.id] = task
+        self.parent_index[task.id] = parent_id
+        for subtask in task.subtasks:
+            self.index_task(subtask, task.id)
+
+    def unindex_task(self, task):
+        """Remover uma tarefa e suas subtarefas dos índices"""
+        self.task_index.pop(task.id, None)
+        self.parent_index.pop(task.id, None)
+        for subtask in task.subtasks:
+            self.unindex_task(subtask)
+
+    def detach_texts(self, task):
+        """Trazer para a memória os textos longos da subárvore, que vai sair da
+        lista (o arquivo de textos só guarda os textos das tarefas da lista)"""
+        with self.lock:
+            stack = [task]
+            while stack:
+                node = stack.pop()
+                if node.text_ref is not None:
+                    node.set_text(node.full_text())
+                stack.extend(node.subtasks)
+
+    def find_task_by_id(self, task_id):
+        return self.task_index.get(task_id)
+
+    def get_siblings(self, task_id):
+        """Lista que contém a tarefa (subtarefas do pai ou lista raiz)"""
+        parent_id = self.parent_index.get(task_id)
+        if parent_id is None:
+            return self.tasks
+        return self.task_index[parent_id].subtasks
+
+    def index_of(self, task_id):
+        """Posição da tarefa entre os irmãos (None se ela não existe)"""
+        if task_id not in self.task_index:
+            return None
+        task = self.task_index[task_id]
+        for i, sibling in enumerate(self.get_siblings(task_id)):
+            if sibling is task:
+                return i
+        return None
+
+    def detach_task(self, task):
+        """Retirar a tarefa da lista de irmãos (sem mexer nos índices)"""
+        siblings = self.get_siblings(task.id)
+        for i, sibling in enumerate(siblings):
+            if sibling is task:
+                del siblings[i]
+                return i
+        return None
+
+    def remove_task_by_id(self, task_id):
+        """Remover a tarefa (com suas subtarefas) do modelo e retorná-la"""
+        task = self.task_index.get(task_id)
+        if not task:
+            return None
+
+        self.detach_task(task)
+        self.unindex_task(task)
+        return task
+
+    def relocate_task(self, task_id, new_parent_id=None, position=None):
+        """Mover a tarefa no modelo; retorna None se o destino for inválido"""
+        task = self.task_index.get(task_id)
+        if not task:
+            return None
+
+        # Não permitir mover uma tarefa para dentro de si mesma
+        ancestor_id = new_parent_id
+        while ancestor_id is not None:
+            if ancestor_id == task_id:
+                return None
+            ancestor_id = self.parent_index.get(ancestor_id)
+
+        if new_parent_id is not None and new_parent_id not in self.task_index:
+            return None
+
+        self.detach_task(task)
+
+        if new_parent_id is None:
+            target = self.tasks
+        else:
+            target = self.task_index[new_parent_id].subtasks
+
+        if position is None:
+            target.append(task)
+        else:
+            target.insert(position, task)
+
+        self.parent_index[task_id] = new_parent_id
+        return task
+
+    def generate_id(self, reserved=()):
+        """Novo id único (`reserved`: ids já usados por tarefas ainda fora da lista)"""
+        task_id = str(datetime.now().timestamp())
+        while task_id in self.task_index or task_id in reserved:
+            task_id = str(float(task_id) + 0.000001)
+        return task_id
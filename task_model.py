@@ -0,0 +1,215 @@
+"""
+Registro compacto de uma tarefa
+
+Cada tarefa era um dicionário com as mesmas chaves repetidas em todos os
+nós e com as datas guardadas duas vezes (texto formatado + timestamp).
+Task usa __slots__, guarda só os timestamps e formata as datas apenas
+quando a interface pede. O status é sempre um dos objetos de string
+canônicos (PENDING / DONE), compartilhados por todas as tarefas.
+
+O formato em disco continua o mesmo: `to_dict` / `from_dict` convertem de
+e para o esquema JSON original sem perder informação.
+"""
+
+import sys
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+
+PENDING = "Pendente"
+DONE = "Concluída"
+
+STATUSES = {PENDING: PENDING, DONE: DONE}
+
+CREATED_FORMAT = "%d/%m/%Y %H:%M"
+DEADLINE_FORMAT = "%d/%m/%Y"
+TIME_FORMAT = "%H:%M"
+
+# Chaves do esquema JSON que viram atributos da Task
+TASK_KEYS = ("id", "text", "status", "created", "deadline", "deadline_timestamp", "subtasks")
+
+
+def intern_status(status):
+    """Objeto canônico do status (os desconhecidos também são compartilhados)"""
+    return STATUSES.get(status) or sys.intern(status)
+
+
+@lru_cache(maxsize=4096)
+def format_timestamp(timestamp, fmt):
+    return datetime.fromtimestamp(timestamp).strftime(fmt)
+
+
+@lru_cache(maxsize=4096)
+def parse_timestamp(text, fmt):
+    """Timestamp do texto formatado, ou None se não estiver no formato esperado"""
+    try:
+        return datetime.strptime(text, fmt).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class Task:
+    __slots__ = ("id", "text", "status", "created_ts", "deadline_ts", "subtasks", "extra",
+                 "text_ref")
+
+    def __init__(self, id, text, status=PENDING, created_ts=None, deadline_ts=None,
+                 subtasks=None, extra=None):
+        self.id = id
+        self.text = text
+        self.status = intern_status(status)
+        self.created_ts = created_ts
+        self.deadline_ts = deadline_ts
+        self.subtasks = subtasks if subtasks is not None else []
+        # Chaves do JSON sem atributo próprio (None quando não há nenhuma)
+        self.extra = extra
+        # (TextStore, posição, tamanho) quando `text` é só uma prévia do texto
+        # guardado em disco (ver text_store.py)
+        self.text_ref = None
+
+    def __repr__(self):
+        return f"Task({self.id!r}, {self.text[:30]!r}, {self.status!r})"
+
+    def full_text(self):
+        """Texto completo (lido do arquivo de textos se `text` for uma prévia)"""
+        if self.text_ref is None:
+            return self.text
+        store, offset, length = self.text_ref
+        return store.read(offset, length)
+
+    def set_text(self, text):
+        self.text = text
+        self.text_ref = None
+
+    def ref_fields(self):
+        """Extras gravados no JSON, incluindo a referência ao texto externo"""
+        if self.text_ref is None:
+            return self.extra
+        store, offset, length = self.text_ref
+        return dict(self.extra or {}, text_ref=[store.generation, offset, length])
+
+    @property
+    def created(self):
+        """Data de criação formatada para exibição"""
+        if self.extra and "created" in self.extra:
+            return self.extra["created"]
+        if self.created_ts is None:
+            return "—"
+        return format_timestamp(self.created_ts, CREATED_FORMAT)
+
+    @property
+    def deadline(self):
+        """Data limite formatada, ou None se a tarefa não tem prazo"""
+        if self.extra and "deadline" in self.extra:
+            return self.extra["deadline"]
+        if self.deadline_ts is None:
+            return None
+        return format_timestamp(self.deadline_ts, DEADLINE_FORMAT)
+
+    @property
+    def deadline_time(self):
+        """Hora do prazo ("HH:MM"), ou None se o prazo é só uma data.
+
+        Quem informou a hora fica marcado com "timed" nos extras: um prazo
+        às 00:00 escolhido pelo usuário não vira um prazo só com a data.
+        """
+        if self.deadline_ts is None or not (self.extra and self.extra.get("timed")):
+            return None
+        return format_timestamp(self.deadline_ts, TIME_FORMAT)
+
+    @classmethod
+    def from_dict(cls, data, subtasks=None):
+        """Criar a tarefa a partir do esquema JSON (sem converter as subtarefas,
+        a menos que já venham convertidas em `subtasks`)"""
+        extra = {key: value for key, value in data.items() if key not in TASK_KEYS}
+
+        created = data.get("created")
+        created_ts = parse_timestamp(created, CREATED_FORMAT)
+        if created is not None and (created_ts is None
+                                    or format_timestamp(created_ts, CREATED_FORMAT) != created):
+            # Texto fora do formato: guardar como veio
+            created_ts = None
+            extra["created"] = created
+
+        deadline = data.get("deadline")
+        deadline_ts = data.get("deadline_timestamp")
+        if deadline_ts is None and deadline is not None:
+            deadline_ts = parse_timestamp(deadline, DEADLINE_FORMAT)
+        if deadline is not None and (deadline_ts is None
+                                     or format_timestamp(deadline_ts, DEADLINE_FORMAT) != deadline):
+            extra["deadline"] = deadline
+
+        if subtasks is None:
+            subtasks = [cls.from_dict(subtask) if isinstance(subtask, dict) else subtask
+                        for subtask in data.get("subtasks", [])]
+
+        return cls(data.get("id"), data.get("text", ""), data.get("status", PENDING),
+                   created_ts, deadline_ts, subtasks, extra or None)
+
+    def fields(self):
+        """Campos da própria tarefa no esquema JSON (sem as subtarefas)"""
+        data = {"id": self.id, "text": self.text, "status": self.status}
+        if self.created_ts is not None:
+            data["created"] = format_timestamp(self.created_ts, CREATED_FORMAT)
+        if self.deadline_ts is not None:
+            data["deadline"] = format_timestamp(self.deadline_ts, DEADLINE_FORMAT)
+            data["deadline_timestamp"] = self.deadline_ts
+        extra = self.ref_fields()
+        if extra:
+            data.update(extra)
+        return data
+
+    def to_dict(self):
+        """Tarefa e subtarefas no esquema JSON original"""
+        data = self.fields()
+        data["subtasks"] = [subtask.to_dict() for subtask in self.subtasks]
+        return data
+
+    def update(self, fields, replace=False):
+        """Aplicar campos do esquema JSON (ex.: de uma operação do diário).
+
+        Com `replace`, `fields` tem todos os campos da tarefa: extras que não
+        aparecem nele são removidos.
+        """
+        merged = {"id": self.id} if replace else self.fields()
+        merged.update(fields)
+        # Campos ausentes em `fields` voltam a ser derivados dos timestamps
+        if "deadline_timestamp" in fields and "deadline" not in fields:
+            merged.pop("deadline", None)
+        if "text" in fields and "text_ref" not in fields:
+            merged.pop("text_ref", None)
+        updated = Task.from_dict(merged, subtasks=self.subtasks)
+        for slot in Task.__slots__:
+            setattr(self, slot, getattr(updated, slot))
+
+
+def task_from_json(data):
+    """object_hook do json: converte cada objeto de tarefa em Task (de baixo para cima)"""
+    if "text" in data and "status" in data:
+        return Task.from_dict(data, subtasks=data.get("subtasks", []))
+    return data
+
+
+def task_to_json(value):
+    """default do json: Task vira dicionário (as subtarefas são convertidas pelo encoder)"""
+    if isinstance(value, Task):
+        data = value.fields()
+        data["subtasks"] = value.subtasks
+        return data
+    raise TypeError(f"Objeto do tipo {type(value).__name__} não é serializável em JSON")
+
+
+def make_task(text, deadline, task_id):
+    """Nova tarefa pendente criada agora, com prazo `deadline` (datetime)"""
+    created = datetime.now().replace(second=0, microsecond=0)
+    return Task(task_id, text, PENDING, created.timestamp(), deadline.timestamp())
+
+
+def count_tasks(tasks):
+    """Contar tarefas por status (incluindo subtarefas)"""
+    counts = Counter()
+    stack = list(tasks)
+    while stack:
+        task = stack.pop()
+        counts[task.status] += 1
+        stack.extend(task.subtasks)
+    return counts
@@ -0,0 +1,214 @@
+"""
+Textos longos das tarefas em um arquivo mapeado em memória
+
+Com "text_store": "mmap" no app_config.json, o texto de cada tarefa maior
+que PREVIEW_CHARS vai para um arquivo à parte (tasks_data.json.texts.<n>)
+e a tarefa guarda apenas uma prévia e a posição do texto nesse arquivo
+("text_ref": [n, posição, tamanho] no JSON). A árvore e as notificações
+usam só a prévia; o texto completo é lido do mapa (Task.full_text) quando
+a tarefa é aberta para ver detalhes ou editar.
+
+O arquivo de textos só recebe acréscimos. Quando a maior parte dele vira
+lixo (textos editados ou excluídos), os textos vivos são copiados para um
+arquivo com o número seguinte e o antigo é apagado depois que o arquivo de
+tarefas passa a apontar para o novo, de modo que uma interrupção no meio
+nunca deixa referências para um arquivo incompleto.
+"""
+
+import glob
+import mmap
+import os
+import threading
+
+# Tamanho da prévia mantida em memória (o mesmo corte da árvore)
+PREVIEW_CHARS = 150
+
+# Compactar quando o lixo passar desse tamanho e da metade do arquivo
+COMPACT_MIN_BYTES = 1024 * 1024
+
+
+def preview_of(text):
+    return text[:PREVIEW_CHARS] + "..."
+
+
+def iter_tree(tasks):
+    stack = list(tasks)
+    while stack:
+        task = stack.pop()
+        yield task
+        stack.extend(task.subtasks)
+
+
+class TextStore:
+    def __init__(self, path):
+        self.path = path
+        self.generation = None
+        self.file = None
+        self.map = None
+        self.size = 0
+        self.lock = threading.RLock()
+
+    def blob_path(self, generation):
+        return f"{self.path}.texts.{generation}"
+
+    def generations(self):
+        """Números dos arquivos de textos existentes em disco"""
+        found = []
+        for blob in glob.glob(glob.escape(self.path) + ".texts.*"):
+            suffix = blob.rsplit(".", 1)[1]
+            if suffix.isdigit():
+                found.append(int(suffix))
+        return sorted(found)
+
+    def open(self, generation):
+        self.close()
+        self.generation = generation
+        self.file = open(self.blob_path(generation), 'ab')
+        self.size = self.file.tell()
+
+    def read(self, offset, length):
+        with self.lock:
+            if self.map is None or offset + length > len(self.map):
+                self.remap()
+            return self.map[offset:offset + length].decode('utf-8')
+
+    def remap(self):
+        if self.map is not None:
+            self.map.close()
+        self.file.flush()
+        with open(self.blob_path(self.generation), 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def append(self, text):
+        """Acrescentar um texto; retorna (posição, tamanho) em bytes"""
+        data = text.encode('utf-8')
+        with self.lock:
+            # Fim real do arquivo: outro processo pode ter acrescentado textos
+            self.file.flush()
+            offset = os.fstat(self.file.fileno()).st_size
+            self.file.write(data)
+            self.size = offset + len(data)
+        return offset, len(data)
+
+    def sync(self):
+        with self.lock:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def attach(self, tasks):
+        """Ligar as tarefas carregadas ("text_ref" nos extras) a este arquivo.
+
+        Retorna o número de tarefas com texto externo.
+        """
+        refs = []
+        for task in iter_tree(tasks):
+            if task.extra and "text_ref" in task.extra:
+                refs.append(task)
+
+        generations = {task.extra["text_ref"][0] for task in refs}
+        if len(generations) > 1:
+            # Não deveria acontecer: trazer os textos para a memória
+            for task in refs:
+                inline_text(task, self.path)
+            return 0
+
+        if generations:
+            self.open(generations.pop())
+        elif self.generation is None:
+            existing = self.generations()
+            self.open(existing[-1] + 1 if existing else 1)
+
+        for task in refs:
+            _, offset, length = task.extra.pop("text_ref")
+            task.extra = task.extra or None
+            task.text_ref = (self, offset, length)
+
+        # Os outros arquivos de textos não são apagados aqui: podem ser de
+        # outro processo (ex.: o notificador). Só a compactação feita por
+        # este processo apaga o arquivo antigo (ver remove).
+        return len(refs)
+
+    def externalize(self, tasks):
+        """Mover para o arquivo os textos longos que ainda estão em memória.
+
+        Retorna o total de bytes vivos no arquivo.
+        """
+        if self.generation is None:
+            existing = self.generations()
+            self.open(existing[-1] + 1 if existing else 1)
+
+        live = 0
+        appended = False
+        for task in iter_tree(tasks):
+            if task.text_ref is None and len(task.text) > PREVIEW_CHARS:
+                offset, length = self.append(task.text)
+                task.text = preview_of(task.text)
+                task.text_ref = (self, offset, length)
+                appended = True
+            if task.text_ref is not None:
+                live += task.text_ref[2]
+
+        if appended:
+            self.sync()
+        return live
+
+    def compact(self, tasks, live):
+        """Copiar os textos vivos para um novo arquivo se houver lixo demais.
+
+        Retorna o número do arquivo antigo (a apagar depois de gravar as
+        tarefas) ou None se não houve compactação.
+        """
+        garbage = self.size - live
+        if garbage < COMPACT_MIN_BYTES or garbage < live:
+            return None
+
+        old_generation = self.generation
+        moved = []
+        with self.lock:
+            self.remap()
+            with open(self.blob_path(old_generation + 1), 'wb') as f:
+                position = 0
+                for task in iter_tree(tasks):
+                    if task.text_ref is not None:
+                        _, offset, length = task.text_ref
+                        f.write(self.map[offset:offset + length])
+                        moved.append((task, position, length))
+                        position += length
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.open(old_generation + 1)
+            for task, offset, length in moved:
+                task.text_ref = (self, offset, length)
+        return old_generation
+
+    def remove(self, generation):
+        """Apagar o arquivo antigo de uma compactação feita por este processo
+        (chamado com o FileLock do arquivo de tarefas adquirido)"""
+        if generation is not None and os.path.exists(self.blob_path(generation)):
+            os.remove(self.blob_path(generation))
+
+    def close(self):
+        with self.lock:
+            if self.map is not None:
+                self.map.close()
+                self.map = None
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def inline_text(task, path):
+    """Trazer de volta para a memória o texto de uma tarefa com "text_ref" nos extras"""
+    generation, offset, length = task.extra.pop("text_ref")
+    task.extra = task.extra or None
+    with open(f"{path}.texts.{generation}", 'rb') as f:
+        f.seek(offset)
+        task.text = f.read(length).decode('utf-8')
+
+
+def inline_texts(tasks, path):
+    """Desfazer o armazenamento externo (usado quando "text_store" está desligado)"""
+    for task in iter_tree(tasks):
+        if task.extra and "text_ref" in task.extra:
+            inline_text(task, path)